@@ -0,0 +1,116 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Metric names carry their unit, which also says which way is better.
+# Changes smaller than the floor are timer noise and never count.
+LOWER_IS_BETTER = {"seconds": 0.01, "_ms": 0.05, "_bytes": 4 * 1024 * 1024}
+HIGHER_IS_BETTER = ("_per_second",)
+DEFAULT_TOLERANCE = 0.10
+
+
+def direction(metric: str) -> Optional[str]:
+    if metric.endswith(HIGHER_IS_BETTER):
+        return "higher"
+    if metric.endswith(tuple(LOWER_IS_BETTER)):
+        return "lower"
+    return None  # counts and labels are context, not performance
+
+
+def noise_floor(metric: str) -> float:
+    for suffix, floor in LOWER_IS_BETTER.items():
+        if metric.endswith(suffix):
+            return floor
+    return 0.0
+
+
+def flatten(payload: dict) -> Dict[str, float]:
+    """``step.metric`` -> value for every numeric metric in a results file."""
+    return {
+        f"{step}.{metric}": value
+        for step, metrics in payload["results"].items()
+        for metric, value in metrics.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[dict]:
+    """One row per metric both runs have; ``regression`` marks worsening past ``tolerance``."""
+    old, new = flatten(baseline), flatten(current)
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        better = direction(name.split(".", 1)[1])
+        if better is None:
+            continue
+        before, after = old[name], new[name]
+        change = (after - before) / before if before else 0.0
+        worse = change > tolerance if better == "lower" else change < -tolerance
+        regression = worse and abs(after - before) > noise_floor(name)
+        rows.append(
+            {
+                "metric": name,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": regression,
+            }
+        )
+    return rows
+
+
+def config_differences(baseline: dict, current: dict) -> List[str]:
+    old, new = baseline.get("config", {}), current.get("config", {})
+    return [
+        f"{key}: {old.get(key)} -> {new.get(key)}"
+        for key in sorted(old.keys() | new.keys())
+        if old.get(key) != new.get(key)
+    ]
+
+
+def print_comparison(rows: List[dict], differences: List[str]) -> None:
+    if differences:
+        print("Warning: runs used different settings: " + "; ".join(differences))
+    print(f"{'metric':<44} {'baseline':>12} {'current':>12} {'change':>8}")
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(
+            f"{r['metric']:<44} {r['baseline']:>12.4g} {r['current']:>12.4g} "
+            f"{r['change']:>+8.1%}{flag}"
+        )
+    regressions = sum(r["regression"] for r in rows)
+    print(f"{regressions} regression(s) in {len(rows)} metrics")
+
+
+def load_results(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare two run_benchmarks.py results files (exit code 1 on regressions)."
+    )
+    parser.add_argument("baseline", help="Results file of the reference run")
+    parser.add_argument("current", help="Results file of the run to check")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Relative worsening allowed per metric (default: {DEFAULT_TOLERANCE:g})",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    baseline = load_results(Path(args.baseline))
+    current = load_results(Path(args.current))
+    rows = compare(baseline, current, args.tolerance)
+    print_comparison(rows, config_differences(baseline, current))
+    if any(r["regression"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import itertools
+import random
+import re
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+# Notes follow KNOWLEDGE_CONVENTIONS.md: knowledge/<Domain>/<kebab-case>.md,
+# frontmatter first, one H1 equal to the title, then ##/### sections. Text
+# is drawn from a pseudo-word vocabulary with a Zipf-like distribution plus
+# per-domain topic words, so notes in one domain embed close together and
+# lexical search sees realistic term frequencies. Output only depends on
+# the arguments and the seed.
+
+DOMAINS = (
+    "Android Development",
+    "DevOps",
+    "Security",
+    "Document Automation",
+    "Compliance",
+    "Identity",
+    "Data Engineering",
+    "Networking",
+    "Observability",
+    "Frontend",
+    "Databases",
+    "Search",
+)
+TYPES = ("howto", "reference", "checklist", "policy", "note")
+STATUSES = ("approved", "approved", "approved", "draft", "deprecated")
+SECTION_HEADINGS = (
+    "Problem / Context",
+    "Recommended Approach",
+    "Steps",
+    "Configuration",
+    "Common Pitfalls",
+    "Troubleshooting",
+    "Examples",
+    "Verification",
+    "Rollback",
+    "References",
+)
+SYLLABLES = (
+    "ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "bra", "cen", "dor", "fel", "gan",
+    "hul", "jex", "kor", "lin", "mur", "nox", "pra", "quo", "ser", "tav", "ulm",
+    "vex", "wyn", "sta", "tri", "pel", "dax",
+)
+VOCABULARY_SIZE = 6000
+TOPIC_WORDS = 60
+# Share of words drawn from the note's domain topic words.
+TOPIC_RATIO = 0.3
+FIRST_DATE = date(2024, 1, 1)
+
+
+class TextSource:
+    """Seeded word sampler: a shared vocabulary plus topic words per domain."""
+
+    def __init__(self, rng: random.Random, domains: Sequence[str]) -> None:
+        self.rng = rng
+        words: Dict[str, None] = {}
+        while len(words) < VOCABULARY_SIZE:
+            words["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))] = None
+        self.words = list(words)
+        weights = [1 / rank for rank in range(1, len(self.words) + 1)]
+        self.cum_weights = list(itertools.accumulate(weights))
+        self.topics = {d: rng.sample(self.words[200:], TOPIC_WORDS) for d in domains}
+
+    def words_for(self, domain: str, count: int) -> List[str]:
+        common = self.rng.choices(self.words, cum_weights=self.cum_weights, k=count)
+        topic = self.topics[domain]
+        return [
+            self.rng.choice(topic) if self.rng.random() < TOPIC_RATIO else word
+            for word in common
+        ]
+
+    def sentence(self, domain: str, words: int) -> str:
+        text = " ".join(self.words_for(domain, max(words, 3)))
+        return text[0].upper() + text[1:] + "."
+
+    def paragraph(self, domain: str, words: int) -> str:
+        sentences = []
+        while words > 0:
+            length = min(words, self.rng.randint(8, 18))
+            sentences.append(self.sentence(domain, length))
+            words -= length
+        return " ".join(sentences)
+
+
+def kebab(words: Sequence[str]) -> str:
+    return "-".join(w.lower() for w in words)
+
+
+def note_text(
+    source: TextSource,
+    title: str,
+    domain: str,
+    sections: int,
+    paragraph_words: int,
+    links: Sequence[str],
+) -> str:
+    rng = source.rng
+    created = FIRST_DATE + timedelta(days=rng.randint(0, 600))
+    updated = created + timedelta(days=rng.randint(0, 120))
+    tags = sorted(set(rng.sample(source.topics[domain], rng.randint(2, 5))))
+    lines = [
+        "---",
+        f"title: {title}",
+        f"type: {rng.choice(TYPES)}",
+        f"domain: {domain}",
+        "tags:",
+        *(f"  - {tag}" for tag in tags),
+        f"status: {rng.choice(STATUSES)}",
+        f"created: {created.isoformat()}",
+        f"updated: {updated.isoformat()}",
+        "---",
+        "",
+        f"# {title}",
+        "",
+        source.paragraph(domain, paragraph_words // 2),
+        "",
+    ]
+    headings = rng.sample(SECTION_HEADINGS, min(sections, len(SECTION_HEADINGS)))
+    for heading in headings:
+        lines += [f"## {heading}", ""]
+        for _ in range(rng.randint(1, 3)):
+            words = max(10, int(rng.gauss(paragraph_words, paragraph_words / 3)))
+            lines += [source.paragraph(domain, words), ""]
+        roll = rng.random()
+        if roll < 0.3:
+            lines += [f"- {source.sentence(domain, rng.randint(4, 10))}" for _ in range(4)]
+            lines.append("")
+        elif roll < 0.45:
+            command = " ".join(source.words_for(domain, 4))
+            lines += ["```bash", f"kbctl {command} --verbose", "```", ""]
+        elif roll < 0.6:
+            sub = " ".join(source.words_for(domain, 2)).title()
+            lines += [f"### {sub}", "", source.paragraph(domain, paragraph_words), ""]
+    if links:
+        lines += ["## Related", ""]
+        lines += [f"- [[{slug}]]" for slug in links]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_kb(
+    root: Path,
+    notes: int = 500,
+    domains: int = 8,
+    sections: int = 5,
+    paragraph_words: int = 60,
+    seed: int = 0,
+) -> List[Path]:
+    """Write ``notes`` synthetic notes under ``root``/knowledge and return their paths."""
+    rng = random.Random(seed)
+    chosen = DOMAINS[: max(1, min(domains, len(DOMAINS)))]
+    source = TextSource(rng, chosen)
+    knowledge = root / "knowledge"
+    slugs: List[str] = []
+    paths: List[Path] = []
+    for i in range(notes):
+        domain = chosen[i % len(chosen)]
+        words = source.words_for(domain, rng.randint(3, 5))
+        while kebab(words) in slugs:
+            words.append(source.rng.choice(source.topics[domain]))
+        slug = kebab(words)
+        title = " ".join(words).title()
+        count = max(2, int(rng.gauss(sections, sections / 3)))
+        links = rng.sample(slugs, min(len(slugs), rng.randint(0, 3)))
+        path = knowledge / domain / f"{slug}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = note_text(source, title, domain, count, paragraph_words, links)
+        path.write_text(text, encoding="utf-8")
+        slugs.append(slug)
+        paths.append(path)
+    return paths
+
+
+def edit_notes(paths: Sequence[Path], count: int, seed: int = 0) -> List[Path]:
+    """Append a short section to ``count`` notes, like a round of small edits."""
+    rng = random.Random(seed + 1)
+    edited = rng.sample(list(paths), min(count, len(paths)))
+    for i, path in enumerate(edited):
+        with path.open("a", encoding="utf-8") as f:
+            f.write(f"\n## Update {i + 1}\n\nRevised after review on run {seed}.\n")
+    return edited
+
+
+def synthetic_queries(paths: Sequence[Path], count: int, seed: int = 0) -> List[str]:
+    """Short queries cut from random paragraphs of the notes."""
+    rng = random.Random(seed + 2)
+    queries: List[str] = []
+    while len(queries) < count:
+        text = rng.choice(paths).read_text(encoding="utf-8")
+        lines = [
+            line
+            for line in text.split("\n---\n", 1)[-1].splitlines()
+            if line and line[0].isalpha()
+        ]
+        if not lines:
+            continue
+        words = re.findall(r"[a-z]+", rng.choice(lines).lower())
+        length = rng.randint(2, 6)
+        start = rng.randint(0, max(0, len(words) - length))
+        queries.append(" ".join(words[start:start + length]))
+    return queries
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic knowledge/ tree for benchmarks."
+    )
+    parser.add_argument("root", help="Directory to create knowledge/ in (must not have one)")
+    parser.add_argument("--notes", type=int, default=500, help="Number of notes")
+    parser.add_argument(
+        "--domains", type=int, default=8, help=f"Domain folders (max {len(DOMAINS)})"
+    )
+    parser.add_argument("--sections", type=int, default=5, help="Mean ## sections per note")
+    parser.add_argument(
+        "--paragraph-words", type=int, default=60, help="Mean words per paragraph"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    root = Path(args.root)
+    if (root / "knowledge").exists():
+        sys.exit(f"{root / 'knowledge'} already exists; pick an empty directory")
+    paths = generate_kb(
+        root, args.notes, args.domains, args.sections, args.paragraph_words, args.seed
+    )
+    size = sum(p.stat().st_size for p in paths)
+    print(f"Wrote {len(paths)} notes ({size / 1e6:.1f} MB) to {root / 'knowledge'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.compare_results import (  # noqa: E402
+    DEFAULT_TOLERANCE,
+    compare,
+    config_differences,
+    load_results,
+    print_comparison,
+)
+from benchmarks.generate_kb import edit_notes, generate_kb, synthetic_queries  # noqa: E402
+from scripts.ann_index import ENGINES, STORAGES  # noqa: E402
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL  # noqa: E402
+from scripts.typesense_client import add_connection_arguments  # noqa: E402
+
+# Every run builds a fresh KB in a scratch directory: the synthetic notes
+# plus a copy of scripts/ (the scripts find knowledge/ and .kb_index/ next
+# to themselves), then runs each step in its own process via steps.py.
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+SCHEMA_VERSION = 1
+COPY_IGNORE = shutil.ignore_patterns("__pycache__", "results", "*.ps1", "*.sh")
+
+
+def prepare_workdir(workdir: Path) -> None:
+    for name in ("scripts", "benchmarks"):
+        shutil.copytree(ROOT / name, workdir / name, ignore=COPY_IGNORE)
+    # Reuse ONNX exports instead of exporting the model again in every run.
+    models = ROOT / ".kb_index" / "models"
+    if models.is_dir():
+        (workdir / ".kb_index").mkdir()
+        try:
+            (workdir / ".kb_index" / "models").symlink_to(models, target_is_directory=True)
+        except OSError:
+            pass  # e.g. Windows without symlink rights: export once per run
+
+
+def step_arguments(args: argparse.Namespace) -> List[str]:
+    argv = ["--model", args.model, "--backend", args.backend]
+    argv += ["--index-type", args.index_type, "--k", str(args.k)]
+    if args.storage:
+        argv += ["--storage", args.storage]
+    if args.workers is not None:
+        argv += ["--workers", str(args.workers)]
+    return argv
+
+
+def run_step(workdir: Path, step: str, argv: List[str]) -> dict:
+    """Run one steps.py step in a fresh interpreter; adds its wall time."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(workdir / "benchmarks" / "steps.py"), step, *argv],
+        cwd=workdir,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{step} step failed:\n{proc.stderr[-4000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_seconds"] = wall
+    return result
+
+
+def start_standin() -> "tuple[subprocess.Popen, int]":
+    proc = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "typesense_standin.py"), "--port", "0"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if not line:
+        proc.kill()
+        raise RuntimeError("Typesense stand-in did not start")
+    return proc, int(line.rsplit(":", 1)[1])
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "git_commit": git_commit(),
+    }
+
+
+def run_benchmarks(args: argparse.Namespace, workdir: Path) -> dict:
+    prepare_workdir(workdir)
+    start = time.perf_counter()
+    paths = generate_kb(
+        workdir, args.notes, args.domains, args.sections, args.paragraph_words, args.seed
+    )
+    generate_seconds = time.perf_counter() - start
+    print(f"Generated {len(paths)} notes in {workdir / 'knowledge'}")
+    queries_path = workdir / "queries.json"
+    queries = synthetic_queries(paths, args.queries, args.seed)
+    queries_path.write_text(json.dumps(queries), encoding="utf-8")
+
+    argv = step_arguments(args)
+    results = {
+        "generate": {
+            "seconds": generate_seconds,
+            "notes": len(paths),
+            "bytes": sum(p.stat().st_size for p in paths),
+        }
+    }
+
+    def record(name: str, step: str, extra: Optional[List[str]] = None) -> None:
+        print(f"Running {name}...", flush=True)
+        results[name] = run_step(workdir, step, argv + (extra or []))
+
+    record("index_cold", "index")
+    record("index_warm", "index")
+    edits = max(1, round(len(paths) * args.edit_fraction))
+    edit_notes(paths, edits, args.seed)
+    record("index_incremental", "index")
+    record("bm25_cold", "bm25")
+    record("query", "query", ["--queries", str(queries_path)])
+
+    if args.typesense != "off":
+        standin = None
+        if args.typesense == "standin":
+            standin, port = start_standin()
+            connection = ["--host", "127.0.0.1", "--port", str(port)]
+        else:
+            connection = ["--host", args.host, "--port", str(args.port)]
+            connection += ["--api-key", args.api_key]
+        connection += ["--batch-size", str(args.batch_size)]
+        connection += ["--concurrency", str(args.concurrency)]
+        try:
+            record("typesense_import", "typesense", connection)
+        finally:
+            if standin is not None:
+                standin.terminate()
+                standin.wait()
+
+    config = {
+        key: getattr(args, key)
+        for key in (
+            "notes",
+            "domains",
+            "sections",
+            "paragraph_words",
+            "seed",
+            "queries",
+            "k",
+            "edit_fraction",
+            "model",
+            "backend",
+            "index_type",
+            "storage",
+            "workers",
+            "typesense",
+            "batch_size",
+            "concurrency",
+        )
+    }
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+
+
+def print_summary(payload: dict) -> None:
+    results = payload["results"]
+    cold = results["index_cold"]
+    print(
+        f"\nFAISS cold build: {cold['seconds']:.2f}s for {cold['chunks']} chunks "
+        f"({cold.get('chunks_per_second', 0):.0f} chunks/s, encode "
+        f"{cold.get('encode_chunks_per_second', 0):.0f} chunks/s), "
+        f"model load {cold['model_load_seconds']:.2f}s"
+    )
+    warm, incremental = results["index_warm"], results["index_incremental"]
+    print(
+        f"FAISS warm rebuild: {warm['seconds']:.3f}s; after editing "
+        f"{incremental['files_rebuilt']} notes: {incremental['seconds']:.3f}s "
+        f"({incremental['chunks_embedded']} chunks re-embedded)"
+    )
+    bm25 = results["bm25_cold"]
+    print(f"BM25 cold build: {bm25['seconds']:.2f}s for {bm25['chunks']} chunks")
+    query = results["query"]
+    print(
+        f"Query latency ({query['queries']} queries): p50 {query['p50_ms']:.2f} ms, "
+        f"p95 {query['p95_ms']:.2f} ms, p99 {query['p99_ms']:.2f} ms; index only "
+        f"p50 {query['index_p50_ms']:.3f} ms; batched "
+        f"{query['batch_queries_per_second']:.0f} queries/s"
+    )
+    if "typesense_import" in results:
+        ts = results["typesense_import"]
+        print(
+            f"Typesense import: {ts['documents']} documents in {ts['import_seconds']:.2f}s "
+            f"({ts['documents_per_second']:.0f} docs/s, {ts['failed']} failed); "
+            f"unchanged re-sync {ts['sync_unchanged_seconds']:.2f}s"
+        )
+    peaks = [
+        f"{name} {r['max_rss_bytes'] / 2**20:.0f} MiB"
+        for name, r in results.items()
+        if r.get("max_rss_bytes")
+    ]
+    if peaks:
+        print("Peak RSS: " + ", ".join(peaks))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark indexing, search and Typesense import on a synthetic KB."
+    )
+    parser.add_argument("--notes", type=int, default=500, help="Synthetic notes")
+    parser.add_argument("--domains", type=int, default=8, help="Domain folders")
+    parser.add_argument("--sections", type=int, default=5, help="Mean ## sections per note")
+    parser.add_argument(
+        "--paragraph-words", type=int, default=60, help="Mean words per paragraph"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the KB")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument(
+        "--edit-fraction",
+        type=float,
+        default=0.01,
+        help="Share of notes edited before the incremental rebuild (default: 0.01)",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Local model name or path")
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=BACKENDS,
+        help="Encoder backend (default: torch or KB_ENCODER_BACKEND env var)",
+    )
+    parser.add_argument(
+        "--index-type", default="auto", choices=("auto",) + ENGINES, help="Index engine"
+    )
+    parser.add_argument(
+        "--storage", default=None, choices=STORAGES, help="Vector storage (default: float32)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Processes for parsing notes"
+    )
+    parser.add_argument(
+        "--typesense",
+        default="standin",
+        choices=("standin", "server", "off"),
+        help="Import into the in-memory stand-in (default), a real server "
+        "(--host/--port), or skip it",
+    )
+    parser.add_argument("--batch-size", type=int, default=100, help="Typesense batch size")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Typesense batches in flight"
+    )
+    add_connection_arguments(parser)
+    parser.add_argument(
+        "--output",
+        default="",
+        help="Results file (default: benchmarks/results/<UTC time>.json)",
+    )
+    parser.add_argument(
+        "--baseline",
+        default="",
+        help="Compare against this results file; exit code 1 on regressions",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Relative worsening allowed per metric (default: {DEFAULT_TOLERANCE:g})",
+    )
+    parser.add_argument(
+        "--workdir", default="", help="Build the KB here (must not exist) and keep it"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.workdir:
+        workdir = Path(args.workdir)
+        if workdir.exists():
+            sys.exit(f"{workdir} already exists; pick a new directory")
+        workdir.mkdir(parents=True)
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="kb-bench-"))
+    try:
+        payload = run_benchmarks(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        output = Path(args.output)
+    else:
+        output = RESULTS_DIR / (payload["created"].replace(":", "") + ".json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    print_summary(payload)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        baseline = load_results(Path(args.baseline))
+        rows = compare(baseline, payload, args.tolerance)
+        print()
+        print_comparison(rows, config_differences(baseline, payload))
+        if any(r["regression"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.ann_index import ENGINES, STORAGES  # noqa: E402
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL  # noqa: E402
+from scripts.typesense_client import add_connection_arguments  # noqa: E402
+
+# One benchmark step per process, run by run_benchmarks.py from the copy of
+# this file inside the benchmark KB, so ROOT (and with it knowledge/ and
+# .kb_index/) is the synthetic KB and the memory high-water mark is the
+# step's own. The result is printed as one JSON line.
+
+STEPS = ("index", "bm25", "query", "typesense")
+
+
+def max_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def percentiles(prefix: str, latencies_ms: List[float]) -> dict:
+    cuts = statistics.quantiles(latencies_ms, n=100, method="inclusive")
+    return {
+        f"{prefix}p50_ms": cuts[49],
+        f"{prefix}p95_ms": cuts[94],
+        f"{prefix}p99_ms": cuts[98],
+    }
+
+
+def run_index(args: argparse.Namespace) -> dict:
+    from scripts.encoders import load_encoder
+    from scripts.query_cache import model_key
+    from scripts.search import build_index
+
+    start = time.perf_counter()
+    model = load_encoder(args.model, args.backend)
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = build_index(
+        model,
+        args.index_type,
+        workers=args.workers,
+        model_id=model_key(args.model, args.backend),
+        verbose=False,
+        storage=args.storage,
+    )
+    seconds = time.perf_counter() - start
+    result = {
+        "seconds": seconds,
+        "model_load_seconds": load_seconds,
+        "encode_seconds": stats["encode_seconds"],
+        "files_rebuilt": stats["files_rebuilt"],
+        "chunks": stats["chunks"],
+        "chunks_embedded": stats["chunks_embedded"],
+        "chunks_reused": stats["chunks_reused"],
+    }
+    if stats["chunks_embedded"]:
+        result["chunks_per_second"] = stats["chunks_embedded"] / seconds
+        result["encode_chunks_per_second"] = (
+            stats["chunks_embedded"] / stats["encode_seconds"]
+        )
+    return result
+
+
+def run_bm25(args: argparse.Namespace) -> dict:
+    from scripts.search_bm25 import build_bm25_index
+
+    start = time.perf_counter()
+    stats = build_bm25_index(workers=args.workers)
+    seconds = time.perf_counter() - start
+    result = {
+        "seconds": seconds,
+        "chunks": stats["chunks"],
+        "files_rebuilt": stats["rebuilt"],
+    }
+    if stats["rebuilt"]:
+        result["chunks_per_second"] = stats["chunks"] / seconds
+    return result
+
+
+def run_query(args: argparse.Namespace) -> dict:
+    from scripts.ann_index import search_parameters
+    from scripts.encoders import load_encoder
+    from scripts.search import encode_queries, load_index, search_batch
+
+    queries = json.loads(Path(args.queries).read_text(encoding="utf-8"))
+    # The bare model bypasses the query and result caches, so every query
+    # is encoded and searched.
+    model = load_encoder(args.model, args.backend)
+    loaded = load_index()
+    index, store, index_params = loaded
+    try:
+        search_batch(queries[:8], args.k, -1.0, model, loaded=loaded)  # warm-up
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            search_batch([query], args.k, -1.0, model, loaded=loaded)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # The index alone, without encoding or chunk lookups.
+        vectors = encode_queries(model, queries)
+        params = search_parameters(index_params["engine"], index_params["params"])
+        index_latencies = []
+        for row in vectors:
+            start = time.perf_counter()
+            index.search(row[None, :], args.k, params=params)
+            index_latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        search_batch(queries, args.k, -1.0, model, loaded=loaded)
+        batch_seconds = time.perf_counter() - start
+    finally:
+        store.close()
+    return {
+        "queries": len(queries),
+        "engine": index_params["engine"],
+        "storage": index_params.get("storage", "float32"),
+        **percentiles("", latencies),
+        **percentiles("index_", index_latencies),
+        "batch_queries_per_second": len(queries) / batch_seconds,
+    }
+
+
+def run_typesense(args: argparse.Namespace) -> dict:
+    from scripts.index_typesense import (
+        create_schema,
+        import_documents,
+        iter_documents,
+        suppress_typesense_warnings,
+        sync_documents,
+    )
+    from scripts.typesense_client import client_from_args
+
+    with suppress_typesense_warnings():
+        client = client_from_args(args)
+        name = f"kb_bench_{os.getpid()}"
+        create_schema(client, name)
+        try:
+            stats = import_documents(
+                client,
+                name,
+                iter_documents(args.workers),
+                args.batch_size,
+                args.concurrency,
+            )
+            # What a re-run on an unchanged KB costs: export hashes, parse, send nothing.
+            start = time.perf_counter()
+            sync_documents(
+                client, name, args.batch_size, args.workers, args.concurrency
+            )
+            sync_seconds = time.perf_counter() - start
+        finally:
+            client.collections[name].delete()
+    return {
+        "documents": stats["imported"],
+        "failed": stats["failed"],
+        "import_seconds": stats["seconds"],
+        "documents_per_second": stats["imported"] / stats["seconds"],
+        "sync_unchanged_seconds": sync_seconds,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run one benchmark step against this KB (used by run_benchmarks.py)."
+    )
+    parser.add_argument("step", choices=STEPS, help="Step to run")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Local model name or path")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--index-type", default="auto", choices=("auto",) + ENGINES)
+    parser.add_argument("--storage", default=None, choices=STORAGES)
+    parser.add_argument("--workers", type=int, default=None, help="Parsing processes")
+    parser.add_argument("--queries", default="", help="JSON list of queries (query step)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=100, help="Typesense batch size")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Typesense batches in flight"
+    )
+    add_connection_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    runners = {
+        "index": run_index,
+        "bm25": run_bm25,
+        "query": run_query,
+        "typesense": run_typesense,
+    }
+    result = runners[args.step](args)
+    result["max_rss_bytes"] = max_rss_bytes()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+# In-memory server speaking the slice of the Typesense API index_typesense.py
+# uses: /health, collections, aliases, and document import, export and
+# delete-by-filter. Imports parse and store every JSONL document, so the
+# benchmark measures our side (parsing notes, building and sending batches,
+# reading results) without a Docker container. It is not a search engine.
+
+DEFAULT_PORT = 8109
+ID_FILTER = re.compile(r"id:\s*=?\s*\[(.*)\]")
+PATH_FILTER = re.compile(r"path:\s*=?\s*\[(.*)\]")
+
+
+def filter_values(match: Optional[re.Match]) -> Optional[set]:
+    if match is None:
+        return None
+    return {v.strip().strip("`") for v in match.group(1).split(",") if v.strip()}
+
+
+class Store:
+    """Collections (name -> schema and documents by ID) and aliases."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.collections: Dict[str, dict] = {}
+        self.aliases: Dict[str, str] = {}
+
+    def collection(self, name: str) -> Optional[dict]:
+        return self.collections.get(self.aliases.get(name, name))
+
+    @staticmethod
+    def info(collection: dict) -> dict:
+        return dict(collection["schema"], num_documents=len(collection["docs"]))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store: Store
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def reply(self, status: int, body, content_type: str = "application/json") -> None:
+        data = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def not_found(self) -> None:
+        self.reply(404, {"message": "Not Found"})
+
+    def route(self) -> Tuple[List[str], dict]:
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return parts, query
+
+    def read_body(self) -> str:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else ""
+
+    def do_GET(self) -> None:
+        parts, query = self.route()
+        store = self.store
+        with store.lock:
+            if parts == ["health"]:
+                return self.reply(200, {"ok": True})
+            if parts == ["collections"]:
+                return self.reply(200, [store.info(c) for c in store.collections.values()])
+            if parts[:1] == ["aliases"] and len(parts) == 2:
+                if parts[1] not in store.aliases:
+                    return self.not_found()
+                return self.reply(
+                    200, {"name": parts[1], "collection_name": store.aliases[parts[1]]}
+                )
+            if parts[:1] != ["collections"] or len(parts) < 2:
+                return self.not_found()
+            collection = store.collection(parts[1])
+            if collection is None:
+                return self.not_found()
+            if len(parts) == 2:
+                return self.reply(200, store.info(collection))
+            if parts[2:] == ["documents", "export"]:
+                fields = [f for f in query.get("include_fields", "").split(",") if f]
+                paths = filter_values(PATH_FILTER.fullmatch(query.get("filter_by", "")))
+                lines = [
+                    json.dumps({k: v for k, v in doc.items() if not fields or k in fields})
+                    for doc in collection["docs"].values()
+                    if paths is None or doc.get("path") in paths
+                ]
+                return self.reply(200, "\n".join(lines), "text/plain")
+        self.not_found()
+
+    def do_POST(self) -> None:
+        parts, query = self.route()
+        body = self.read_body()
+        store = self.store
+        if parts == ["collections"]:
+            schema = json.loads(body)
+            with store.lock:
+                if schema["name"] in store.collections:
+                    return self.reply(409, {"message": "Collection already exists"})
+                store.collections[schema["name"]] = {"schema": schema, "docs": {}}
+            return self.reply(201, schema)
+        if parts[:1] == ["collections"] and parts[2:] == ["documents", "import"]:
+            # Decode outside the lock, like a server parsing requests in parallel.
+            docs = [json.loads(line) for line in body.splitlines() if line.strip()]
+            with store.lock:
+                collection = store.collection(parts[1])
+                if collection is None:
+                    return self.not_found()
+                for doc in docs:
+                    collection["docs"][str(doc["id"])] = doc
+            results = "\n".join('{"success":true}' for _ in docs)
+            return self.reply(200, results, "text/plain")
+        self.not_found()
+
+    def do_PUT(self) -> None:
+        parts, _ = self.route()
+        body = self.read_body()
+        if parts[:1] == ["aliases"] and len(parts) == 2:
+            target = json.loads(body)["collection_name"]
+            with self.store.lock:
+                self.store.aliases[parts[1]] = target
+            return self.reply(200, {"name": parts[1], "collection_name": target})
+        self.not_found()
+
+    def do_DELETE(self) -> None:
+        parts, query = self.route()
+        store = self.store
+        with store.lock:
+            if parts[:1] == ["aliases"] and len(parts) == 2:
+                target = store.aliases.pop(parts[1], None)
+                if target is None:
+                    return self.not_found()
+                return self.reply(200, {"name": parts[1], "collection_name": target})
+            if parts[:1] != ["collections"] or len(parts) < 2:
+                return self.not_found()
+            if len(parts) == 2:
+                collection = store.collections.pop(parts[1], None)
+                if collection is None:
+                    return self.not_found()
+                return self.reply(200, store.info(collection))
+            collection = store.collection(parts[1])
+            if collection is None or parts[2:] != ["documents"]:
+                return self.not_found()
+            ids = filter_values(ID_FILTER.fullmatch(query.get("filter_by", ""))) or set()
+            deleted = sum(collection["docs"].pop(i, None) is not None for i in ids)
+            return self.reply(200, {"num_deleted": deleted})
+
+
+def make_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """A stand-in bound to ``host``:``port`` (0 picks a free port); call serve_forever()."""
+    handler = type("StandinHandler", (Handler,), {"store": Store()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run an in-memory Typesense stand-in for import benchmarks."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to bind, 0 for any free port (default: {DEFAULT_PORT})",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    server = make_server(args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Typesense stand-in listening on {host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
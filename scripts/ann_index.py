@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import faiss
+    import numpy as np
+
+# faiss and numpy are imported where used, so CLIs that only need ENGINES
+# or the saved params (argparse, --help, the server client) start fast.
+
+ENGINES = ("flat", "hnsw", "ivf-flat", "ivf-pq")
+# HNSW graphs cannot drop vectors, so those indexes are always rebuilt.
+REMOVABLE_ENGINES = ("flat", "ivf-flat", "ivf-pq")
+
+# How vectors are held in the index: full float32, float16 (half the
+# memory) or 8-bit scalar quantization (a quarter; per-dimension ranges are
+# trained on the corpus, later additions are clipped to them). ivf-pq
+# already compresses vectors and ignores this.
+STORAGES = ("float32", "float16", "sq8")
+DEFAULT_STORAGE = os.getenv("KB_VECTOR_STORAGE", "float32")
+SQ_TYPES = {"float16": "QT_fp16", "sq8": "QT_8bit"}
+
+# Corpus sizes (in chunks) at which "auto" switches to the next engine.
+AUTO_HNSW_MIN_CHUNKS = 10_000
+AUTO_IVF_FLAT_MIN_CHUNKS = 100_000
+AUTO_IVF_PQ_MIN_CHUNKS = 1_000_000
+
+
+def choose_engine(n_vectors: int) -> str:
+    if n_vectors < AUTO_HNSW_MIN_CHUNKS:
+        return "flat"
+    if n_vectors < AUTO_IVF_FLAT_MIN_CHUNKS:
+        return "hnsw"
+    if n_vectors < AUTO_IVF_PQ_MIN_CHUNKS:
+        return "ivf-flat"
+    return "ivf-pq"
+
+
+def default_params(engine: str, n_vectors: int, dim: int) -> dict:
+    if engine == "flat":
+        return {}
+    if engine == "hnsw":
+        return {"M": 32, "ef_construction": 80, "ef_search": 64}
+
+    # Rule of thumb: ~4*sqrt(n) lists, but keep ~39 training points per list.
+    nlist = max(1, min(int(4 * math.sqrt(max(n_vectors, 1))), n_vectors // 39))
+    params = {"nlist": nlist, "nprobe": max(1, nlist // 16)}
+    if engine == "ivf-pq":
+        m = max(d for d in range(1, dim // 4 + 1) if dim % d == 0)
+        # PQ codebooks also want ~39 training points per centroid.
+        nbits = max(1, min(8, int(math.log2(max(n_vectors // 39, 2)))))
+        params.update({"m": m, "nbits": nbits})
+    return params
+
+
+def build_engine(
+    embeddings: np.ndarray,
+    engine: str,
+    params: dict,
+    ids: Optional[np.ndarray] = None,
+    storage: str = "float32",
+) -> faiss.Index:
+    """Build (and train, if needed) an inner-product index over normalized vectors.
+
+    With ``ids`` the index is searched and updated by those chunk IDs rather
+    than by row position (flat and HNSW are wrapped in an IndexIDMap; IVF
+    indexes store IDs natively). ``storage`` (see STORAGES) picks the
+    scalar-quantized variant of flat, HNSW and IVF-flat.
+    """
+    import faiss
+
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown vector storage: {storage} (expected one of {STORAGES})")
+    dim = embeddings.shape[1]
+    metric = faiss.METRIC_INNER_PRODUCT
+    qtype = None
+    if storage in SQ_TYPES:
+        qtype = getattr(faiss.ScalarQuantizer, SQ_TYPES[storage])
+    if engine == "flat":
+        if qtype is None:
+            index = faiss.IndexFlatIP(dim)
+        else:
+            index = faiss.IndexScalarQuantizer(dim, qtype, metric)
+    elif engine == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, params["M"], metric)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, params["M"], metric)
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+    elif engine in ("ivf-flat", "ivf-pq"):
+        quantizer = faiss.IndexFlatIP(dim)
+        if engine == "ivf-flat" and qtype is not None:
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, params["nlist"], qtype, metric
+            )
+        elif engine == "ivf-flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"], metric)
+        else:
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, params["nlist"], params["m"], params["nbits"], metric
+            )
+        index.train(embeddings)
+        index.nprobe = params["nprobe"]
+    else:
+        raise ValueError(f"Unknown index engine: {engine} (expected one of {ENGINES})")
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is None:
+        index.add(embeddings)
+        return index
+    if engine in ("flat", "hnsw"):
+        index = faiss.IndexIDMap(index)
+    index.add_with_ids(embeddings, ids)
+    return index
+
+
+def remove_ids(index: faiss.Index, ids: List[int]) -> int:
+    import numpy as np
+
+    if not ids:
+        return 0
+    return index.remove_ids(np.asarray(ids, dtype="int64"))
+
+
+def search_parameters(
+    engine: str,
+    params: dict,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None,
+) -> Optional[faiss.SearchParameters]:
+    """Per-query knobs, so concurrent searches never mutate the shared index."""
+    import faiss
+
+    if engine == "hnsw":
+        return faiss.SearchParametersHNSW(
+            efSearch=ef_search or params["ef_search"], sel=selector
+        )
+    if engine in ("ivf-flat", "ivf-pq"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or params["nprobe"], sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def id_selector(ids: np.ndarray) -> faiss.IDSelector:
+    import faiss
+
+    return faiss.IDSelectorBatch(ids)
+
+
+def search_subset(
+    index: faiss.Index,
+    engine: str,
+    params: dict,
+    queries: np.ndarray,
+    k: int,
+    selector: faiss.IDSelector,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Search only the vectors ``selector`` (see id_selector) accepts.
+
+    Flat indexes then score only the selected vectors; graph and IVF indexes
+    skip the rest during traversal (IVF still only sees the probed lists, so
+    very narrow filters may return fewer than k).
+    """
+    search_params = search_parameters(engine, params, nprobe, ef_search, selector)
+    return index.search(queries, k, params=search_params)
+
+
+def save_params(
+    path: Path,
+    engine: str,
+    params: dict,
+    n_vectors: int,
+    dim: int,
+    next_id: Optional[int] = None,
+    storage: str = "float32",
+    model: Optional[str] = None,
+    index_type: Optional[str] = None,
+) -> None:
+    # next_id and model tie the index to the embedding cache state it was
+    # built from; index_type is what was asked for ("auto" or the engine),
+    # which later builds keep.
+    payload = {
+        "engine": engine,
+        "index_type": index_type or engine,
+        "storage": storage,
+        "model": model,
+        "params": params,
+        "n_vectors": n_vectors,
+        "dim": dim,
+        "next_id": next_id,
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def load_params(path: Path) -> dict:
+    # Indexes built before engines (or storages) were selectable are flat
+    # (float32).
+    if not path.exists():
+        return {"engine": "flat", "storage": "float32", "params": {}}
+    params = json.loads(path.read_text(encoding="utf-8"))
+    params.setdefault("storage", "float32")
+    return params
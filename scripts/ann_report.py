@@ -0,0 +1,161 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.ann_index import (  # noqa: E402
+    STORAGES,
+    build_engine,
+    default_params,
+    search_parameters,
+)
+from scripts.search import load_cached_embeddings  # noqa: E402
+
+HNSW_EF_SEARCH = (16, 32, 64, 128, 256)
+IVF_NPROBE = (1, 2, 4, 8, 16, 32, 64)
+
+
+def sample_queries(embeddings: np.ndarray, n: int, noise: float, seed: int) -> np.ndarray:
+    """Perturbed corpus vectors, so queries sit near (not on) indexed chunks."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(n, len(embeddings)), replace=False)
+    queries = embeddings[rows] + rng.normal(0, noise, (len(rows), embeddings.shape[1]))
+    queries = queries.astype("float32")
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def measure(index: faiss.Index, queries: np.ndarray, k: int, params, truth: np.ndarray) -> dict:
+    latencies: List[float] = []
+    found = np.empty((len(queries), k), dtype="int64")
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return {
+        "recall": hits / truth.size,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def index_bytes(index: faiss.Index) -> int:
+    return int(faiss.serialize_index(index).size)
+
+
+def run_report(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    storages: Sequence[str] = STORAGES,
+) -> List[dict]:
+    n, dim = embeddings.shape
+    rows: List[dict] = []
+
+    flat = build_engine(embeddings, "flat", {})
+    _, truth = flat.search(queries, k)
+    if "float32" in storages:
+        rows.append(
+            {
+                "engine": "flat",
+                "storage": "float32",
+                "setting": "-",
+                "bytes": index_bytes(flat),
+            }
+            | measure(flat, queries, k, None, truth)
+        )
+
+    for storage in storages:
+        for engine in ("flat", "hnsw", "ivf-flat", "ivf-pq"):
+            if (engine == "flat" and storage == "float32") or (
+                engine == "ivf-pq" and storage != "float32"
+            ):
+                continue  # the baseline above; PQ ignores the storage
+            params = default_params(engine, n, dim)
+            start = time.perf_counter()
+            try:
+                index = build_engine(embeddings, engine, params, storage=storage)
+            except RuntimeError as e:
+                print(f"Skipping {engine} ({storage}): {e}")
+                continue
+            build_s = time.perf_counter() - start
+            size = index_bytes(index)
+            if engine == "flat":
+                sweep = [(None, None)]
+            elif engine == "hnsw":
+                sweep = [("ef_search", ef) for ef in HNSW_EF_SEARCH]
+            else:
+                sweep = [("nprobe", p) for p in IVF_NPROBE if p <= params["nlist"]]
+            for knob, value in sweep:
+                knobs = {knob: value} if knob else {}
+                search_params = search_parameters(engine, params, **knobs)
+                rows.append(
+                    {
+                        "engine": engine,
+                        "storage": storage,
+                        "setting": f"{knob}={value}" if knob else "-",
+                        "bytes": size,
+                        "build_s": build_s,
+                    }
+                    | measure(index, queries, k, search_params, truth)
+                )
+    return rows
+
+
+def print_report(rows: List[dict], n: int, k: int) -> None:
+    print(f"Recall@{k} vs flat float32 over {n} chunks")
+    print(
+        f"{'engine':<10} {'storage':<8} {'setting':<14} {'recall':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'MB':>8}"
+    )
+    for r in rows:
+        print(
+            f"{r['engine']:<10} {r['storage']:<8} {r['setting']:<14} {r['recall']:>7.3f} "
+            f"{r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['bytes'] / 1e6:>8.2f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare ANN index engines and vector storages against the "
+        "flat float32 index (recall vs latency and size)."
+    )
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sample queries")
+    parser.add_argument(
+        "--noise", type=float, default=0.05, help="Gaussian noise added to sampled queries"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    parser.add_argument(
+        "--storage",
+        nargs="+",
+        default=list(STORAGES),
+        choices=STORAGES,
+        help="Vector storages to compare (default: all)",
+    )
+    parser.add_argument("--json", default="", help="Also write rows to this JSON file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    embeddings = load_cached_embeddings()
+    queries = sample_queries(embeddings, args.queries, args.noise, args.seed)
+    rows = run_report(embeddings, queries, args.k, args.storage)
+    print_report(rows, len(embeddings), args.k)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Table file layout: MAGIC, uint32 format version, uint64 blob generation,
+# then one TABLE_DTYPE record per live chunk, sorted by id. Blob offsets
+# point into ``chunks-<generation>.bin``, which holds one UTF-8 JSON object
+# per chunk. The table is the commit point: blobs are only ever appended to
+# (or compacted into a new generation) before the table is replaced.
+MAGIC = b"KBCS"
+FORMAT_VERSION = 1
+HEADER_SIZE = 16
+TABLE_DTYPE = np.dtype([("id", "<i8"), ("offset", "<u8"), ("length", "<u4")])
+
+# Compact once dead (removed or superseded) bytes outweigh live ones.
+COMPACT_DEAD_RATIO = 1.0
+
+
+def blob_path_for(table_path: Path, generation: int) -> Path:
+    return table_path.with_name(f"chunks-{generation}.bin")
+
+
+def _read_header(f: BinaryIO) -> int:
+    f.seek(0)
+    header = f.read(HEADER_SIZE)
+    if header[:4] != MAGIC:
+        raise ValueError(f"Not a chunk store table: {f.name}")
+    version = int.from_bytes(header[4:8], "little")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported chunk store version {version}: {f.name}")
+    return int.from_bytes(header[8:16], "little")
+
+
+def _read_table(f: BinaryIO) -> np.ndarray:
+    count = (os.fstat(f.fileno()).st_size - HEADER_SIZE) // TABLE_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=TABLE_DTYPE)
+    return np.memmap(
+        f, dtype=TABLE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)
+    )
+
+
+def read_table(table_path: Path) -> Tuple[int, np.ndarray]:
+    """Return (generation, in-memory copy of the offset table)."""
+    with table_path.open("rb") as f:
+        return _read_header(f), np.array(_read_table(f))
+
+
+def _write_table(table_path: Path, generation: int, table: np.ndarray) -> None:
+    tmp_path = table_path.with_name(table_path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(FORMAT_VERSION.to_bytes(4, "little"))
+        f.write(generation.to_bytes(8, "little"))
+        f.write(np.ascontiguousarray(table, dtype=TABLE_DTYPE).tobytes())
+    os.replace(tmp_path, table_path)
+
+
+def _append_records(
+    blob_path: Path, records: Iterable[Tuple[int, dict]]
+) -> np.ndarray:
+    rows = []
+    with blob_path.open("ab") as f:
+        offset = f.tell()
+        for chunk_id, record in records:
+            data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+            f.write(data)
+            rows.append((chunk_id, offset, len(data)))
+            offset += len(data)
+    return np.array(rows, dtype=TABLE_DTYPE)
+
+
+class ChunkStore:
+    """Read-only view of the chunk store; records are decoded only on lookup."""
+
+    def __init__(self, table_path: Path) -> None:
+        # Header and table come from one handle, so a concurrent writer that
+        # replaces the table cannot pair our generation with its records.
+        with table_path.open("rb") as f:
+            generation = _read_header(f)
+            self.table = _read_table(f)
+        self._ids = self.table["id"]
+        blob_path = blob_path_for(table_path, generation)
+        self._blob_file = blob_path.open("rb")
+        size = os.fstat(self._blob_file.fileno()).st_size
+        self._blob = (
+            mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if size
+            else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def get(self, chunk_id: int) -> Optional[dict]:
+        pos = int(np.searchsorted(self._ids, chunk_id))
+        if pos >= len(self._ids) or self._ids[pos] != chunk_id:
+            return None
+        row = self.table[pos]
+        start = int(row["offset"])
+        return json.loads(self._blob[start:start + int(row["length"])])
+
+    def close(self) -> None:
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._blob_file.close()
+
+
+def write_chunk_store(table_path: Path, records: Iterable[Tuple[int, dict]]) -> None:
+    """Write a fresh store generation holding exactly ``records``."""
+    generation = read_table(table_path)[0] + 1 if table_path.exists() else 0
+    blob_path = blob_path_for(table_path, generation)
+    blob_path.unlink(missing_ok=True)
+    table = _append_records(blob_path, records)
+    table.sort(order="id")
+    _write_table(table_path, generation, table)
+    _remove_old_generations(table_path, generation)
+
+
+def update_chunk_store(
+    table_path: Path, removed_ids: List[int], records: List[Tuple[int, dict]]
+) -> None:
+    """Drop ``removed_ids`` and append ``records`` without rewriting live blobs."""
+    generation, table = read_table(table_path)
+    new_ids = [chunk_id for chunk_id, _ in records]
+    drop = np.isin(table["id"], np.asarray(removed_ids + new_ids, dtype="int64"))
+    table = table[~drop]
+
+    blob_path = blob_path_for(table_path, generation)
+    live_bytes = int(table["length"].sum())
+    dead_bytes = blob_path.stat().st_size - live_bytes
+    if dead_bytes > COMPACT_DEAD_RATIO * live_bytes:
+        store = ChunkStore(table_path)
+        try:
+            kept = [(int(i), store.get(int(i))) for i in table["id"]]
+        finally:
+            store.close()
+        write_chunk_store(table_path, kept + list(records))
+        return
+
+    table = np.concatenate([table, _append_records(blob_path, records)])
+    table.sort(order="id")
+    _write_table(table_path, generation, table)
+
+
+def _remove_old_generations(table_path: Path, generation: int) -> None:
+    for path in table_path.parent.glob("chunks-*.bin"):
+        if path != blob_path_for(table_path, generation):
+            try:
+                path.unlink()
+            except OSError:
+                # Still mapped by a reader on a platform that forbids deletion.
+                pass
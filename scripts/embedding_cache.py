@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from scripts.chunk_store import ChunkStore, update_chunk_store, write_chunk_store
+
+# Packed layout under the cache directory:
+#   embeddings-<generation>.f32  float32 rows, appended as files are encoded
+#                                (.f16: float16 rows, half the disk)
+#   chunks.idx / chunks-*.bin    chunk records keyed by chunk ID (chunk_store)
+# and the cache index JSON, which maps each note to its hash, chunk IDs,
+# per-chunk text hashes, filterable frontmatter and the contiguous row range
+# holding its embeddings. The JSON is saved last, so rows appended after it
+# are discarded on the next open.
+
+# Compact once rows from edited or deleted notes outnumber live rows.
+COMPACT_DEAD_RATIO = 1.0
+# Row dtype -> embeddings file suffix.
+DTYPES = {"float32": "f32", "float16": "f16"}
+
+
+def chunk_hash(text: str) -> str:
+    """Key of a chunk's embedding: chunks with equal text share one vector."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings and chunks of every indexed note, in one packed matrix."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        index_path: Path,
+        dim: int,
+        model: Optional[str] = None,
+        chunker: Optional[str] = None,
+        dtype: Optional[str] = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.index_path = index_path
+        self.dim = dim
+        self.chunks_path = cache_dir / "chunks.idx"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        state = {"files": {}}
+        if index_path.exists():
+            state = json.loads(index_path.read_text(encoding="utf-8"))
+        self.next_id: int = state.get("next_id", 0)
+        self.generation: int = state.get("generation", 0)
+        self.rows: int = state.get("rows", 0)
+        self.git_commit: Optional[str] = state.get("git_commit")
+        # Notes that differed from git_commit when the cache was saved; a
+        # later diff against that commit misses them once they are reverted.
+        self.git_dirty: Optional[List[str]] = state.get("git_dirty")
+        self.files: Dict[str, dict] = state["files"]
+        self.dtype: str = state.get("dtype", "float32")
+        # Caches written before the model was recorded are assumed to match.
+        self.model: Optional[str] = model or state.get("model")
+        stored_model = state.get("model")
+        model_changed = bool(model and stored_model and model != stored_model)
+        self.chunker: Optional[str] = chunker or state.get("chunker")
+        # Notes chunked with other settings must be re-chunked even if
+        # unchanged; chunks whose text comes out the same keep their vectors.
+        self.stale_chunks = bool(chunker and state.get("chunker") != chunker)
+        # True once cached notes were dropped wholesale; their chunk IDs are
+        # then unknown, so an index built from the old state must be rebuilt.
+        self.reset = False
+        if state.get("dim", dim) != dim or model_changed:
+            # Different embedding model: nothing cached is reusable.
+            self.files = {}
+            self.rows = 0
+            self.reset = True
+
+        self._removed_ids: List[int] = []
+        self._records: List[tuple] = []
+        self._legacy_paths: List[Path] = []
+
+        expected = self.rows * self.dim * np.dtype(self.dtype).itemsize
+        emb_path = self.embeddings_path
+        if (emb_path.stat().st_size if emb_path.exists() else 0) < expected:
+            # Matrix lost or truncated: re-encode everything.
+            self.files = {}
+            self.rows = expected = 0
+            self.reset = True
+        with emb_path.open("ab") as f:
+            f.truncate(expected)
+        if dtype and dtype != self.dtype:
+            self._convert(dtype)
+        legacy = [p for p, entry in self.files.items() if "row" not in entry]
+        if legacy:
+            self._migrate_legacy(legacy)
+
+    @property
+    def embeddings_path(self) -> Path:
+        return self.cache_dir / f"embeddings-{self.generation}.{DTYPES[self.dtype]}"
+
+    def get(self, rel_path: str, file_hash: str) -> Optional[dict]:
+        entry = self.files.get(rel_path)
+        if entry and entry["hash"] == file_hash:
+            return entry
+        return None
+
+    def allocate_ids(self, count: int) -> List[int]:
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return ids
+
+    def put(
+        self,
+        rel_path: str,
+        file_hash: str,
+        chunks: List[dict],
+        embeddings: np.ndarray,
+        ids: Optional[List[int]] = None,
+        metadata: Optional[dict] = None,
+        hashes: Optional[List[str]] = None,
+    ) -> dict:
+        old = self.files.get(rel_path)
+        if old:
+            self._removed_ids.extend(old["ids"])
+        if ids is None:
+            ids = self.allocate_ids(len(chunks))
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        with self.embeddings_path.open("ab") as f:
+            f.write(embeddings.tobytes())
+        entry = {"hash": file_hash, "ids": ids, "row": self.rows, "count": len(ids)}
+        if old and "stat" in old:
+            entry["stat"] = old["stat"]
+        if metadata is not None:
+            entry["metadata"] = metadata
+        if hashes is not None:
+            entry["hashes"] = hashes
+        self.rows += len(ids)
+        self.files[rel_path] = entry
+        self._records.extend(zip(ids, chunks))
+        return entry
+
+    def update_records(self, records: List[tuple]) -> None:
+        """Replace stored chunk records (id, record) without touching embeddings."""
+        self._records.extend(records)
+
+    def set_stat(self, rel_path: str, stat: List[int]) -> None:
+        self.files[rel_path]["stat"] = stat
+
+    def remove(self, rel_path: str) -> Optional[dict]:
+        entry = self.files.pop(rel_path, None)
+        if entry:
+            self._removed_ids.extend(entry["ids"])
+        return entry
+
+    def chunk_rows(self) -> Dict[str, int]:
+        """chunk_hash -> matrix row, over every cached chunk.
+
+        Entries cached before chunk hashes were recorded get them from
+        their stored chunk texts.
+        """
+        missing = [e for e in self.files.values() if "hashes" not in e]
+        if missing:
+            records = self.chunks([i for e in missing for i in e["ids"]])
+            offset = 0
+            for entry in missing:
+                texts = records[offset:offset + entry["count"]]
+                offset += entry["count"]
+                if all(r is not None for r in texts):
+                    entry["hashes"] = [chunk_hash(r["text"]) for r in texts]
+        rows: Dict[str, int] = {}
+        for entry in self.files.values():
+            for i, h in enumerate(entry.get("hashes", ())):
+                rows.setdefault(h, entry["row"] + i)
+        return rows
+
+    def rows_at(self, rows: List[int]) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, self.dim), dtype="float32")
+        return np.asarray(self._matrix()[np.asarray(rows)], dtype="float32")
+
+    def _matrix(self) -> np.ndarray:
+        if self.rows == 0:
+            return np.zeros((0, self.dim), dtype="float32")
+        return np.memmap(
+            self.embeddings_path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim)
+        )
+
+    def embeddings(self, entries: List[dict]) -> np.ndarray:
+        """Rows for ``entries``, concatenated in order, in one gather."""
+        rows = [np.arange(e["row"], e["row"] + e["count"]) for e in entries]
+        if not rows:
+            return np.zeros((0, self.dim), dtype="float32")
+        return np.asarray(self._matrix()[np.concatenate(rows)], dtype="float32")
+
+    def chunks(self, ids: List[int]) -> List[Optional[dict]]:
+        """Records for ``ids``, including those put since the last save().
+
+        Unknown IDs give None. The chunk store is only opened for IDs that
+        are not pending, and may not exist yet (e.g. right after a migration
+        from the per-note layout).
+        """
+        pending = dict(self._records)
+        stored: Dict[int, Optional[dict]] = {}
+        missing = [chunk_id for chunk_id in ids if chunk_id not in pending]
+        if missing and self.chunks_path.exists():
+            store = ChunkStore(self.chunks_path)
+            try:
+                stored = {chunk_id: store.get(chunk_id) for chunk_id in missing}
+            finally:
+                store.close()
+        return [
+            pending[chunk_id] if chunk_id in pending else stored.get(chunk_id)
+            for chunk_id in ids
+        ]
+
+    def save(self) -> None:
+        live_rows = sum(e["count"] for e in self.files.values())
+        if self.rows - live_rows > COMPACT_DEAD_RATIO * live_rows:
+            self._compact()
+
+        if self.chunks_path.exists():
+            update_chunk_store(self.chunks_path, self._removed_ids, self._records)
+        else:
+            write_chunk_store(self.chunks_path, self._records)
+        self._removed_ids = []
+        self._records = []
+
+        state = {
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "model": self.model,
+            "chunker": self.chunker,
+            "next_id": self.next_id,
+            "generation": self.generation,
+            "rows": self.rows,
+            "git_commit": self.git_commit,
+            "git_dirty": self.git_dirty,
+            "files": self.files,
+        }
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+        for path in self.cache_dir.glob("embeddings-*.f*"):
+            if path != self.embeddings_path:
+                path.unlink(missing_ok=True)
+        for path in self._legacy_paths:
+            path.unlink(missing_ok=True)
+        self._legacy_paths = []
+
+    def _compact(self) -> None:
+        entries = list(self.files.values())
+        matrix = self.embeddings(entries)
+        self.generation += 1
+        self.embeddings_path.write_bytes(matrix.astype(self.dtype).tobytes())
+        row = 0
+        for entry in entries:
+            entry["row"] = row
+            row += entry["count"]
+        self.rows = row
+
+    def _convert(self, dtype: str) -> None:
+        """Rewrite the matrix with ``dtype`` rows; no note is re-embedded."""
+        matrix = np.asarray(self._matrix(), dtype=dtype)
+        self.dtype = dtype
+        self.generation += 1
+        self.embeddings_path.write_bytes(matrix.tobytes())
+
+    def _migrate_legacy(self, rel_paths: List[str]) -> None:
+        """Pack per-note ``{key}.json`` + ``{key}.npy`` cache files."""
+        for rel_path in rel_paths:
+            entry = self.files.pop(rel_path)
+            meta_path = self.cache_dir / f"{entry['key']}.json"
+            emb_path = self.cache_dir / f"{entry['key']}.npy"
+            self._legacy_paths.extend([meta_path, emb_path])
+            if not meta_path.exists() or not emb_path.exists():
+                continue
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            embeddings = np.load(emb_path)
+            if embeddings.size and embeddings.shape[1] != self.dim:
+                continue
+            ids = entry.get("ids")
+            hashes = [chunk_hash(chunk["text"]) for chunk in meta["chunks"]]
+            self.put(
+                rel_path, entry["hash"], meta["chunks"], embeddings, ids, hashes=hashes
+            )
+        print(f"Migrated {len(rel_paths)} cached files to the packed cache")
@@ -0,0 +1,127 @@
+import argparse
+import os
+import platform
+import shutil
+import sys
+from pathlib import Path
+from typing import List
+
+KB_ROOT = Path(__file__).resolve().parents[1]
+MODELS_DIR = KB_ROOT / ".kb_index" / "models"
+
+sys.path.insert(0, str(KB_ROOT))
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.getenv("KB_ENCODER_BACKEND", "torch")
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# ONNX backends must stay this close (1 - cosine similarity) to PyTorch.
+DEFAULT_TOLERANCE = 0.02
+
+
+def quantization_target() -> str:
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "arm64"
+    return "avx2"
+
+
+def export_dir(model_name: str, backend: str) -> Path:
+    return MODELS_DIR / f"{model_name.replace('/', '__')}-{backend}"
+
+
+def _export_onnx(model_name: str, backend: str, target: Path) -> None:
+    """One-time ONNX export (and int8 quantization) into ``target``."""
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Exporting {model_name} for the {backend} backend (one-time)...")
+    tmp_dir = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save_pretrained(str(tmp_dir))
+    if backend == "onnx-int8":
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        export_dynamic_quantized_onnx_model(
+            model, quantization_target(), str(tmp_dir)
+        )
+    tmp_dir.replace(target)
+
+
+def load_encoder(model_name: str = DEFAULT_MODEL, backend: str = DEFAULT_BACKEND):
+    """Return a SentenceTransformer running on the requested backend."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend} (expected one of {BACKENDS})")
+
+    target = export_dir(model_name, backend)
+    if not target.exists():
+        MODELS_DIR.mkdir(parents=True, exist_ok=True)
+        _export_onnx(model_name, backend, target)
+    if backend == "onnx-int8":
+        file_name = f"onnx/model_qint8_{quantization_target()}.onnx"
+        return SentenceTransformer(
+            str(target), backend="onnx", model_kwargs={"file_name": file_name}
+        )
+    return SentenceTransformer(str(target), backend="onnx")
+
+
+def check_backend(
+    model_name: str, backend: str, texts: List[str], tolerance: float
+) -> bool:
+    """Compare ``backend`` embeddings with PyTorch ones on ``texts``."""
+    import numpy as np
+
+    reference = load_encoder(model_name, "torch").encode(
+        texts, normalize_embeddings=True
+    )
+    candidate = load_encoder(model_name, backend).encode(
+        texts, normalize_embeddings=True
+    )
+    similarity = np.sum(np.asarray(reference) * np.asarray(candidate), axis=1)
+    worst = float(similarity.min())
+    print(
+        f"{backend} vs torch over {len(texts)} chunks: "
+        f"mean cosine {float(similarity.mean()):.4f}, min {worst:.4f}"
+    )
+    ok = worst >= 1 - tolerance
+    print("OK" if ok else f"FAILED: min cosine below {1 - tolerance:.4f}")
+    return ok
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Export an encoder backend and check it against PyTorch."
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Local model name or path")
+    parser.add_argument(
+        "--backend", default="onnx-int8", choices=BACKENDS, help="Backend to check"
+    )
+    parser.add_argument(
+        "--samples", type=int, default=200, help="KB chunks to compare"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Allowed 1 - cosine similarity (default: {DEFAULT_TOLERANCE})",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    from scripts.search import load_corpus
+
+    args = parse_args()
+    chunks = load_corpus()
+    step = max(1, len(chunks) // max(args.samples, 1))
+    texts = [c.text for c in chunks[::step][: args.samples]]
+    ok = check_backend(args.model, args.backend, texts, args.tolerance)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# A subset of Typesense's filter_by syntax over the frontmatter fields:
+#   domain:Search && (type:howto || type:reference) && status:!=deprecated
+#   tags:[pandoc, latex]      any of the listed values
+#   domain:=`Document Automation`   exact (case-sensitive) match
+# ``field:value`` compares case-insensitively; ``!=`` negates.
+
+FILTER_FIELDS = ("tags", "domain", "type", "status")
+
+Clause = Tuple[str, str, List[str]]
+Node = Union[Clause, Tuple[str, list]]
+
+_CLAUSE = re.compile(r"(\w+)\s*:\s*(!=|=)?\s*")
+_VALUE = re.compile(r"(?:(?!&&|\|\|)[^()])+")
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _tokenize(expr: str) -> list:
+    tokens: list = []
+    i = 0
+    while i < len(expr):
+        if expr[i].isspace():
+            i += 1
+        elif expr[i] in "()":
+            tokens.append(expr[i])
+            i += 1
+        elif expr.startswith(("&&", "||"), i):
+            tokens.append(expr[i:i + 2])
+            i += 2
+        else:
+            match = _CLAUSE.match(expr, i)
+            if not match:
+                raise FilterError(f"Expected field:value at {expr[i:]!r}")
+            field, op = match.group(1), match.group(2) or ""
+            if field not in FILTER_FIELDS:
+                raise FilterError(
+                    f"Unknown filter field {field!r} (expected one of {FILTER_FIELDS})"
+                )
+            i = match.end()
+            if expr.startswith("[", i):
+                end = expr.find("]", i)
+                if end < 0:
+                    raise FilterError(f"Unclosed '[' in {expr!r}")
+                raw = expr[i + 1:end].split(",")
+                i = end + 1
+            elif expr.startswith("`", i):
+                end = expr.find("`", i + 1)
+                if end < 0:
+                    raise FilterError(f"Unclosed '`' in {expr!r}")
+                raw = [expr[i + 1:end]]
+                i = end + 1
+            else:
+                value = _VALUE.match(expr, i)
+                raw = [value.group(0)] if value else []
+                i = value.end() if value else i
+            values = [v.strip().strip("`'\"") for v in raw if v.strip()]
+            if not values:
+                raise FilterError(f"Missing value for {field!r} in {expr!r}")
+            tokens.append((field, op, values))
+    return tokens
+
+
+def parse_filter(expr: str) -> Optional[Node]:
+    """Parse a filter expression; None for an empty one."""
+    tokens = _tokenize(expr)
+    if not tokens:
+        return None
+    pos = 0
+
+    def parse_or() -> Node:
+        nonlocal pos
+        nodes = [parse_and()]
+        while pos < len(tokens) and tokens[pos] == "||":
+            pos += 1
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and() -> Node:
+        nonlocal pos
+        nodes = [parse_factor()]
+        while pos < len(tokens) and tokens[pos] == "&&":
+            pos += 1
+            nodes.append(parse_factor())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_factor() -> Node:
+        nonlocal pos
+        if pos >= len(tokens):
+            raise FilterError(f"Unexpected end of filter {expr!r}")
+        token = tokens[pos]
+        pos += 1
+        if token == "(":
+            node = parse_or()
+            if pos >= len(tokens) or tokens[pos] != ")":
+                raise FilterError(f"Unclosed '(' in {expr!r}")
+            pos += 1
+            return node
+        if isinstance(token, tuple):
+            return token
+        raise FilterError(f"Unexpected {token!r} in {expr!r}")
+
+    node = parse_or()
+    if pos != len(tokens):
+        raise FilterError(f"Unexpected {tokens[pos]!r} in {expr!r}")
+    return node
+
+
+def _clause_matches(clause: Clause, metadata: dict) -> bool:
+    field, op, values = clause
+    actual = metadata.get(field) or ([] if field == "tags" else "")
+    actual = actual if isinstance(actual, list) else [actual]
+    if op == "=":
+        hit = any(v in actual for v in values)
+    else:
+        folded = {a.casefold() for a in actual}
+        hit = any(v.casefold() in folded for v in values)
+    return not hit if op == "!=" else hit
+
+
+def matches(node: Optional[Node], metadata: dict) -> bool:
+    if node is None:
+        return True
+    if node[0] == "and":
+        return all(matches(child, metadata) for child in node[1])
+    if node[0] == "or":
+        return any(matches(child, metadata) for child in node[1])
+    return _clause_matches(node, metadata)
+
+
+def compile_filter(expr: str) -> Callable[[dict], bool]:
+    """Predicate over frontmatter metadata (``tags`` is a list, the rest strings)."""
+    node = parse_filter(expr)
+    return lambda metadata: matches(node, metadata)
+
+
+def facet_metadata(metadata: dict) -> dict:
+    """The filterable frontmatter fields of a note, with empty defaults."""
+    return {
+        field: metadata.get(field) or ([] if field == "tags" else "")
+        for field in FILTER_FIELDS
+    }
+
+
+def build_facets(
+    entries: Iterable[Tuple[List[int], dict]]
+) -> Dict[str, Dict[str, List[int]]]:
+    """field -> value -> chunk IDs, from (chunk IDs, facet_metadata) pairs."""
+    facets: Dict[str, Dict[str, List[int]]] = {field: {} for field in FILTER_FIELDS}
+    for ids, metadata in entries:
+        for field in FILTER_FIELDS:
+            value = metadata.get(field) or ([] if field == "tags" else "")
+            for v in value if isinstance(value, list) else [value]:
+                facets[field].setdefault(v, []).extend(ids)
+    return facets
+
+
+def facet_arrays(facets: Dict[str, Dict[str, List[int]]]) -> dict:
+    """Facets with each ID list as a sorted unique int64 array, plus the universe."""
+    import numpy as np
+
+    arrays = {
+        field: {
+            value: np.unique(np.asarray(ids, dtype="int64"))
+            for value, ids in values.items()
+        }
+        for field, values in facets.items()
+    }
+    # Every chunk has exactly one (possibly empty) domain value.
+    domain_ids = list(arrays["domain"].values())
+    arrays["_all"] = (
+        np.unique(np.concatenate(domain_ids))
+        if domain_ids
+        else np.zeros(0, dtype="int64")
+    )
+    return arrays
+
+
+def select_ids(node: Optional[Node], facets: dict):
+    """Sorted int64 array of the chunk IDs matching ``node`` (facets from facet_arrays)."""
+    import numpy as np
+
+    def union(arrays: list) -> "np.ndarray":
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, dtype="int64")
+
+    def evaluate(node: Node) -> "np.ndarray":
+        if node[0] == "and":
+            result = evaluate(node[1][0])
+            for child in node[1][1:]:
+                result = np.intersect1d(result, evaluate(child), assume_unique=True)
+            return result
+        if node[0] == "or":
+            return union([evaluate(child) for child in node[1]])
+        field, op, values = node
+        if op == "=":
+            keys = [v for v in values if v in facets[field]]
+        else:
+            wanted = {v.casefold() for v in values}
+            keys = [key for key in facets[field] if key.casefold() in wanted]
+        hit = union([facets[field][key] for key in keys])
+        if op == "!=":
+            return np.setdiff1d(facets["_all"], hit, assume_unique=True)
+        return hit
+
+    return facets["_all"] if node is None else evaluate(node)
@@ -0,0 +1,91 @@
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Typesense hits and FAISS results share no ID, but both carry the chunk's
+# path and text. (path, heading) is not enough: a long section is split into
+# several windows under the same heading.
+ChunkKey = Tuple[str, str]
+
+FUSION_METHODS = ("rrf", "weighted")
+# Standard RRF damping constant (Cormack et al.); larger flattens rank gaps.
+RRF_K = 60
+SOURCES = ("lexical", "vector")
+
+
+def chunk_key(item: dict) -> ChunkKey:
+    digest = hashlib.sha1(item["text"].encode("utf-8")).hexdigest()
+    return item["path"], digest
+
+
+def lexical_items(hits: List[dict]) -> List[dict]:
+    """Flatten Typesense hits into result dicts scored by ``text_match``."""
+    return [dict(hit["document"], score=float(hit.get("text_match", 0))) for hit in hits]
+
+
+def _merge(ranked_lists: Sequence[List[dict]], scores: Dict[ChunkKey, float]) -> List[dict]:
+    merged: Dict[ChunkKey, dict] = {}
+    for source, items in zip(SOURCES, ranked_lists):
+        for rank, item in enumerate(items, start=1):
+            key = chunk_key(item)
+            if key not in merged:
+                merged[key] = dict(item, ranks={})
+            merged[key]["ranks"].setdefault(source, rank)
+    for key, item in merged.items():
+        item["score"] = scores[key]
+    return sorted(merged.values(), key=lambda item: item["score"], reverse=True)
+
+
+def fuse_rrf(
+    ranked_lists: Sequence[List[dict]],
+    weights: Optional[Sequence[float]] = None,
+    k: int = RRF_K,
+) -> List[dict]:
+    """Reciprocal rank fusion: sum of weight / (k + rank) over the lists."""
+    weights = weights or [1.0] * len(ranked_lists)
+    scores: Dict[ChunkKey, float] = {}
+    for weight, items in zip(weights, ranked_lists):
+        seen = set()
+        for rank, item in enumerate(items, start=1):
+            key = chunk_key(item)
+            if key in seen:
+                continue
+            seen.add(key)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return _merge(ranked_lists, scores)
+
+
+def fuse_weighted(
+    ranked_lists: Sequence[List[dict]], weights: Optional[Sequence[float]] = None
+) -> List[dict]:
+    """Weighted sum of per-list min-max normalised scores (missing counts as 0)."""
+    weights = weights or [1.0] * len(ranked_lists)
+    scores: Dict[ChunkKey, float] = {}
+    for weight, items in zip(weights, ranked_lists):
+        if not items:
+            continue
+        values = [item["score"] for item in items]
+        low, high = min(values), max(values)
+        best: Dict[ChunkKey, float] = {}
+        for item in items:
+            norm = (item["score"] - low) / (high - low) if high > low else 1.0
+            key = chunk_key(item)
+            best[key] = max(best.get(key, 0.0), norm)
+        for key, norm in best.items():
+            scores[key] = scores.get(key, 0.0) + weight * norm
+    return _merge(ranked_lists, scores)
+
+
+def fuse(
+    lexical: List[dict],
+    vector: List[dict],
+    method: str = "rrf",
+    lexical_weight: float = 0.5,
+) -> List[dict]:
+    """Fuse lexical and vector results; ``lexical_weight`` is in [0, 1]."""
+    weights = (lexical_weight, 1.0 - lexical_weight)
+    if method == "rrf":
+        # Equal weights reproduce plain RRF (0.5 scales every score alike).
+        return fuse_rrf((lexical, vector), weights)
+    if method == "weighted":
+        return fuse_weighted((lexical, vector), weights)
+    raise ValueError(f"Unknown fusion method: {method} (expected one of {FUSION_METHODS})")
@@ -0,0 +1,169 @@
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL  # noqa: E402
+from scripts.fusion import chunk_key, fuse, lexical_items  # noqa: E402
+from scripts.typesense_client import add_connection_arguments, client_from_args  # noqa: E402
+
+METHODS = ("lexical", "vector", "rrf", "weighted")
+
+
+def body_words(text: str) -> List[str]:
+    """Words of a chunk without its heading lines and leading heading path."""
+    lines = text.splitlines()
+    # Chunks of subsections open with "Note title > Section" before the heading.
+    following = next((line for line in lines[1:] if line.strip()), "")
+    if lines and not lines[0].startswith("#") and following.startswith("#"):
+        lines = lines[1:]
+    return " ".join(line for line in lines if not line.startswith("#")).split()
+
+
+def sample_queries(store, n: int, words: int, seed: int) -> List[Tuple[str, tuple]]:
+    """Known-item queries: a run of words from a chunk body, and that chunk's key."""
+    rng = random.Random(seed)
+    ids = [int(i) for i in store.table["id"]]
+    rng.shuffle(ids)
+    queries = []
+    for chunk_id in ids:
+        record = store.get(chunk_id)
+        body = body_words(record["text"])
+        if len(body) < words:
+            continue
+        start = rng.randrange(len(body) - words + 1)
+        queries.append((" ".join(body[start:start + words]), chunk_key(record)))
+        if len(queries) == n:
+            break
+    return queries
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def run_report(
+    queries: List[Tuple[str, tuple]],
+    lexical: Callable[[str], Tuple[List[dict], float]],
+    vector: Callable[[str], Tuple[List[dict], float]],
+    k: int,
+    lexical_weight: float,
+) -> List[dict]:
+    ranks: Dict[str, List[int]] = {m: [] for m in METHODS}
+    latencies: Dict[str, List[float]] = {m: [] for m in METHODS}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for query, target in queries:
+            start = time.perf_counter()
+            lexical_future = executor.submit(lexical, query)
+            vector_future = executor.submit(vector, query)
+            lexical_results, lexical_s = lexical_future.result()
+            vector_results, vector_s = vector_future.result()
+            fused = {
+                method: fuse(lexical_results, vector_results, method, lexical_weight)
+                for method in ("rrf", "weighted")
+            }
+            hybrid_ms = (time.perf_counter() - start) * 1000
+            results = {"lexical": lexical_results, "vector": vector_results, **fused}
+            for method in METHODS:
+                keys = [chunk_key(item) for item in results[method][:k]]
+                ranks[method].append(keys.index(target) + 1 if target in keys else 0)
+            latencies["lexical"].append(lexical_s * 1000)
+            latencies["vector"].append(vector_s * 1000)
+            latencies["rrf"].append(hybrid_ms)
+            latencies["weighted"].append(hybrid_ms)
+
+    rows = []
+    for method in METHODS:
+        found = ranks[method]
+        rows.append(
+            {
+                "method": method,
+                f"recall@{k}": sum(1 for r in found if r) / len(found),
+                "mrr": sum(1 / r for r in found if r) / len(found),
+                "p50_ms": percentile(latencies[method], 50),
+                "p95_ms": percentile(latencies[method], 95),
+            }
+        )
+    return rows
+
+
+def timed(fn: Callable[[str], List[dict]]) -> Callable[[str], Tuple[List[dict], float]]:
+    def run(query: str) -> Tuple[List[dict], float]:
+        start = time.perf_counter()
+        results = fn(query)
+        return results, time.perf_counter() - start
+
+    return run
+
+
+def print_report(rows: List[dict], n: int, k: int) -> None:
+    print(f"Known-item retrieval over {n} queries (hybrid latency = both backends + fusion)")
+    print(f"{'method':<10} {'recall@' + str(k):>9} {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in rows:
+        print(
+            f"{r['method']:<10} {r[f'recall@{k}']:>9.3f} {r['mrr']:>7.3f} "
+            f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare lexical, vector and fused (hybrid) retrieval on the KB."
+    )
+    parser.add_argument("--k", type=int, default=10, help="Cut-off for recall and MRR")
+    parser.add_argument("--candidates", type=int, default=20, help="Results per backend")
+    parser.add_argument("--queries", type=int, default=100, help="Number of sample queries")
+    parser.add_argument("--words", type=int, default=6, help="Words per sampled query")
+    parser.add_argument("--lexical-weight", type=float, default=0.5, help="Lexical weight, 0..1")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Local model name or path")
+    parser.add_argument(
+        "--backend", default=DEFAULT_BACKEND, choices=BACKENDS, help="Encoder backend"
+    )
+    add_connection_arguments(parser)
+    parser.add_argument("--collection", default="kb_chunks", help="Typesense collection")
+    parser.add_argument("--json", default="", help="Also write rows to this JSON file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    from scripts.encoders import load_encoder
+    from scripts.search import load_index, search_index
+    from scripts.search_typesense import search_hits
+
+    args = parse_args()
+    client = client_from_args(args)
+    model = load_encoder(args.model, args.backend)
+    index, store, index_params = load_index()
+    try:
+        queries = sample_queries(store, args.queries, args.words, args.seed)
+
+        def lexical(query: str) -> List[dict]:
+            hits = search_hits(client, args.collection, query, args.candidates)
+            return lexical_items(hits)
+
+        def vector(query: str) -> List[dict]:
+            return search_index(
+                index, store, index_params, query, args.candidates, -1.0, model
+            )
+
+        rows = run_report(
+            queries, timed(lexical), timed(vector), args.k, args.lexical_weight
+        )
+    finally:
+        store.close()
+    print_report(rows, len(queries), args.k)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,89 @@
+import argparse
 from pathlib import Path
 import sys
 
-from sentence_transformers import SentenceTransformer
-
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
-from scripts.search import build_index, INDEX_PATH  # noqa: E402
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, load_encoder  # noqa: E402
+from scripts.query_cache import model_key  # noqa: E402
+from scripts.search_bm25 import build_bm25_index  # noqa: E402
+from scripts.search import (  # noqa: E402
+    build_index,
+    DEFAULT_BATCH_SIZE,
+    ENGINES,
+    INDEX_PATH,
+    STORAGES,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the offline KB vector index.")
+    parser.add_argument(
+        "--model",
+        default="sentence-transformers/all-MiniLM-L6-v2",
+        help="Local model name or path",
+    )
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=BACKENDS,
+        help="Encoder backend (default: torch or KB_ENCODER_BACKEND env var)",
+    )
+    parser.add_argument(
+        "--index-type",
+        default=None,
+        choices=("auto",) + ENGINES,
+        help="Index engine (default: the current index's; auto picks by corpus size)",
+    )
+    parser.add_argument(
+        "--storage",
+        default=None,
+        choices=STORAGES,
+        help="Vector encoding: float32, float16 (half the memory) or sq8 (a quarter). "
+        "Default: the current index's, else KB_VECTOR_STORAGE or float32",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild the whole index instead of updating changed files in place",
+    )
+    parser.add_argument(
+        "--git-changes",
+        action="store_true",
+        help="Only check notes git reports as changed since the last indexed commit",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Chunks per encoder batch (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for reading and chunking notes (0 = in-process)",
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    build_index(model)
+    args = parse_args()
+    model = load_encoder(args.model, args.backend)
+    build_index(
+        model,
+        args.index_type,
+        incremental=not args.full,
+        git_changes=args.git_changes,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        model_id=model_key(args.model, args.backend),
+        storage=args.storage,
+    )
     print(f"Index built at {INDEX_PATH}")
+    stats = build_bm25_index(incremental=not args.full, workers=args.workers)
+    print(f"BM25 index: {stats['chunks']} chunks ({stats['rebuilt']} files re-indexed)")
 
 
 if __name__ == "__main__":
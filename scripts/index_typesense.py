@@ -1,11 +1,15 @@
 import argparse
+import hashlib
 import json
-import os
+import re
 import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from io import StringIO
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import typesense
 from tqdm import tqdm
@@ -32,139 +36,88 @@ def suppress_typesense_warnings():
 KB_ROOT = Path(__file__).resolve().parents[1]
 KNOWLEDGE_DIR = KB_ROOT / "knowledge"
 
-
-def strip_frontmatter(text: str) -> tuple[str, dict]:
-    """Strip YAML frontmatter and return content + metadata."""
-    if not text.startswith("---"):
-        return text, {}
-
-    parts = text.split("---", 2)
-    if len(parts) < 3:
-        return text, {}
-
-    frontmatter_raw = parts[1].strip()
-    content = parts[2].lstrip("\n")
-
-    # Parse YAML frontmatter fields
-    metadata = {}
-    lines = frontmatter_raw.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-
-        if line.startswith("tags:"):
-            tags_part = line.replace("tags:", "").strip()
-            if tags_part.startswith("[") and tags_part.endswith("]"):
-                # Bracket array in frontmatter, e.g. tags: [pandoc, docx]
-                # Try JSON first (["pandoc","docx"]), then YAML-like ([pandoc, docx]).
-                try:
-                    metadata["tags"] = json.loads(tags_part)
-                except json.JSONDecodeError:
-                    inner = tags_part[1:-1].strip()
-                    metadata["tags"] = [t.strip().strip("'\"") for t in inner.split(",") if t.strip()]
-                i += 1
-            elif tags_part:
-                # Inline comma-separated: tags: pandoc, docx
-                metadata["tags"] = [t.strip() for t in tags_part.split(",")]
-                i += 1
-            else:
-                # YAML list format with hyphens on next lines
-                tags = []
-                i += 1
-                while i < len(lines) and lines[i].strip().startswith("-"):
-                    tag = lines[i].strip()[1:].strip()  # Remove hyphen and whitespace
-                    if tag:
-                        tags.append(tag)
-                    i += 1
-                metadata["tags"] = tags
-        elif line.startswith("created:"):
-            metadata["created"] = line.replace("created:", "").strip()
-            i += 1
-        elif line.startswith("updated:"):
-            metadata["updated"] = line.replace("updated:", "").strip()
-            i += 1
-        elif line.startswith("title:"):
-            metadata["title"] = line.replace("title:", "").strip()
-            i += 1
-        elif line.startswith("type:"):
-            metadata["type"] = line.replace("type:", "").strip()
-            i += 1
-        elif line.startswith("domain:"):
-            metadata["domain"] = line.replace("domain:", "").strip()
-            i += 1
-        elif line.startswith("status:"):
-            metadata["status"] = line.replace("status:", "").strip()
-            i += 1
-        else:
-            i += 1
-
-    return content, metadata
-
-
-def iter_markdown_files(root: Path):
-    """Iterate over all markdown files in the knowledge directory."""
-    for path in root.rglob("*.md"):
-        if path.name.startswith("_"):
-            continue
-        yield path
+sys.path.insert(0, str(KB_ROOT))
+
+from scripts.ingest import (  # noqa: E402
+    ParsedFile,
+    iter_markdown_files,
+    iter_parsed_files,
+    parse_file,
+)
+from scripts.typesense_client import add_connection_arguments, client_from_args  # noqa: E402
+
+
+# Document IDs (deletes) or note paths (exports) per filter_by when syncing.
+DELETE_BATCH_SIZE = 100
+# Import batches in flight at once, sharing the client's keep-alive connections.
+DEFAULT_CONCURRENCY = 4
+# Resends of a document Typesense rejected with a transient error.
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_CODES = {408, 429, 500, 502, 503, 504}
+# Request errors no resend can fix (bad schema, auth, missing collection).
+PERMANENT_ERRORS = (
+    typesense.exceptions.RequestMalformed,
+    typesense.exceptions.RequestUnauthorized,
+    typesense.exceptions.RequestForbidden,
+    typesense.exceptions.ObjectNotFound,
+    typesense.exceptions.ObjectUnprocessable,
+)
+MAX_REPORTED_ERRORS = 10
+# Full rebuilds write to <alias>_<UTC timestamp><microseconds> and then
+# move the alias. Versions made before the microseconds were added have 14
+# digits and still sort first.
+VERSION_FORMAT = "%Y%m%d%H%M%S"
+# Superseded versions kept after a rebuild, so the alias can be rolled back.
+DEFAULT_KEEP_VERSIONS = 1
+
+
+def document_id(path: str, heading: str, ordinal: int) -> str:
+    """Stable ID of the ``ordinal``-th section titled ``heading`` in a note."""
+    key = f"{path}\n{heading}\n{ordinal}".encode("utf-8")
+    return hashlib.sha1(key).hexdigest()[:20]
+
+
+def content_hash(doc: dict) -> str:
+    body = {k: v for k, v in doc.items() if k not in ("id", "content_hash")}
+    payload = json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+def chunks_from_parsed(parsed: ParsedFile) -> List[dict]:
+    """Turn a parsed file into Typesense documents (one per chunk)."""
+    metadata = parsed.metadata
+    # Numbering repeated headings separately keeps the IDs of the other
+    # sections stable when a section is inserted or removed.
+    ordinals: Counter = Counter()
+    docs = []
+    for heading, text in parsed.chunks:
+        doc = {
+            "id": document_id(parsed.path, heading, ordinals[heading]),
+            "text": text,
+            "path": parsed.path,
+            "heading": heading,
+            "tags": metadata.get("tags", []),
+            "created": metadata.get("created", ""),
+            "updated": metadata.get("updated", ""),
+            "title": metadata.get("title", ""),
+            "type": metadata.get("type", ""),
+            "domain": metadata.get("domain", ""),
+            "status": metadata.get("status", ""),
+        }
+        doc["content_hash"] = content_hash(doc)
+        ordinals[heading] += 1
+        docs.append(doc)
+    return docs
 
 
 def split_into_chunks(path: Path) -> List[dict]:
     """Split markdown file into searchable chunks."""
-    raw = path.read_text(encoding="utf-8")
-    content, metadata = strip_frontmatter(raw)
-    lines = content.splitlines()
-
-    chunks: List[dict] = []
-    current_heading = "Document"
-    current_lines: List[str] = []
-
-    def flush():
-        if not current_lines:
-            return
-        text = "\n".join(current_lines).strip()
-        if text:
-            chunks.append({
-                "text": text,
-                "path": str(path.relative_to(KB_ROOT)),
-                "heading": current_heading,
-                "tags": metadata.get("tags", []),
-                "created": metadata.get("created", ""),
-                "updated": metadata.get("updated", ""),
-                "title": metadata.get("title", ""),
-                "type": metadata.get("type", ""),
-                "domain": metadata.get("domain", ""),
-                "status": metadata.get("status", ""),
-            })
-
-    for line in lines:
-        if line.startswith("#"):
-            flush()
-            current_heading = line.lstrip("#").strip() or "Document"
-            current_lines = [line]
-        else:
-            current_lines.append(line)
+    return chunks_from_parsed(parse_file(path, KB_ROOT))
 
-    flush()
-    return chunks
 
-
-def create_client(host: str, port: int, api_key: str) -> typesense.Client:
-    """Create Typesense client."""
-    return typesense.Client({
-        'nodes': [{
-            'host': host,
-            'port': port,
-            'protocol': 'http'
-        }],
-        'api_key': api_key,
-        'connection_timeout_seconds': 2
-    })
-
-
-def create_schema(client: typesense.Client, collection_name: str) -> None:
-    """Create or recreate the Typesense collection schema."""
-    schema = {
+def collection_schema(collection_name: str) -> dict:
+    return {
         'name': collection_name,
         'fields': [
             {'name': 'path', 'type': 'string', 'facet': True},
@@ -177,41 +130,283 @@ def create_schema(client: typesense.Client, collection_name: str) -> None:
             {'name': 'type', 'type': 'string', 'facet': True, 'optional': True},
             {'name': 'domain', 'type': 'string', 'facet': True, 'optional': True},
             {'name': 'status', 'type': 'string', 'facet': True, 'optional': True},
+            {'name': 'content_hash', 'type': 'string', 'index': False, 'optional': True},
         ],
         'default_sorting_field': ''
     }
 
-    # Delete existing collection if it exists
-    try:
-        client.collections[collection_name].delete()
-        print(f"Deleted existing collection: {collection_name}")
-    except Exception:
-        pass
 
-    # Create new collection
-    client.collections.create(schema)
+def create_schema(client: typesense.Client, collection_name: str) -> None:
+    """Create the Typesense collection schema."""
+    client.collections.create(collection_schema(collection_name))
     print(f"Created collection: {collection_name}")
 
 
-def index_documents(client: typesense.Client, collection_name: str, batch_size: int = 100) -> None:
-    """Index all KB documents into Typesense."""
-    files = list(iter_markdown_files(KNOWLEDGE_DIR))
-    all_docs = []
+def collection_exists(client: typesense.Client, name: str) -> bool:
+    """True if ``name`` is a collection or an alias of one."""
+    try:
+        client.collections[name].retrieve()
+    except typesense.exceptions.ObjectNotFound:
+        return False
+    return True
 
-    for path in tqdm(files, desc="Processing files", unit="file"):
-        chunks = split_into_chunks(path)
-        all_docs.extend(chunks)
 
-    # Import documents in batches
-    collection = client.collections[collection_name]
-    for i in tqdm(range(0, len(all_docs), batch_size), desc="Indexing batches", unit="batch"):
-        batch = all_docs[i:i + batch_size]
+def alias_target(client: typesense.Client, alias: str) -> Optional[str]:
+    try:
+        return client.aliases[alias].retrieve()['collection_name']
+    except typesense.exceptions.ObjectNotFound:
+        return None
+
+
+def version_name(alias: str) -> str:
+    now = time.time()
+    stamp = time.strftime(VERSION_FORMAT, time.gmtime(now))
+    return f"{alias}_{stamp}{int(now % 1 * 1_000_000):06d}"
+
+
+def collection_versions(client: typesense.Client, alias: str) -> List[str]:
+    """Versioned collections behind ``alias``, oldest first."""
+    pattern = re.compile(rf"{re.escape(alias)}_\d{{14}}(?:\d{{6}})?")
+    return sorted(
+        c['name'] for c in client.collections.retrieve() if pattern.fullmatch(c['name'])
+    )
+
+
+def iter_documents(
+    workers: Optional[int] = None, paths: Optional[List[Path]] = None
+) -> Iterator[dict]:
+    """Typesense documents for every note (or the existing ``paths``), as notes are parsed."""
+    if paths is None:
+        files = list(iter_markdown_files(KNOWLEDGE_DIR))
+    else:
+        files = [path for path in paths if path.is_file()]
+    parsed_files = iter_parsed_files(files, KB_ROOT, workers)
+    for parsed in tqdm(
+        parsed_files,
+        total=len(files),
+        desc="Processing files",
+        unit="file",
+        disable=paths is not None,
+    ):
+        yield from chunks_from_parsed(parsed)
+
+
+def iter_batches(docs: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def indexed_hashes(
+    client: typesense.Client, collection_name: str, paths: Optional[List[str]] = None
+) -> Dict[str, str]:
+    """Document ID -> content hash of everything in the collection (or of ``paths``)."""
+    if paths is None:
+        requests = [{'include_fields': 'id,content_hash'}]
+    else:
+        requests = [
+            {
+                'include_fields': 'id,content_hash',
+                'filter_by': 'path:=['
+                + ','.join(f'`{p}`' for p in paths[i:i + DELETE_BATCH_SIZE])
+                + ']',
+            }
+            for i in range(0, len(paths), DELETE_BATCH_SIZE)
+        ]
+    hashes = {}
+    for params in requests:
+        exported = client.collections[collection_name].documents.export(params)
+        for line in exported.splitlines():
+            if line.strip():
+                doc = json.loads(line)
+                hashes[doc['id']] = doc.get('content_hash', '')
+    return hashes
+
+
+def import_batch(
+    collection, batch: List[dict], retries: int = DEFAULT_RETRIES
+) -> Tuple[int, List[dict]]:
+    """Upsert one batch as JSONL, resending documents that failed transiently.
+
+    Returns the number imported and an error record per document given up on.
+    """
+    imported = 0
+    errors: List[dict] = []
+    pending = batch
+    for attempt in range(retries + 1):
+        jsonl = "\n".join(json.dumps(doc, ensure_ascii=False) for doc in pending)
         try:
-            collection.documents.import_(batch, {'action': 'create'})
+            response = collection.documents.import_(jsonl, {'action': 'upsert'})
+            results = [json.loads(line) for line in response.splitlines() if line.strip()]
+        except PERMANENT_ERRORS as e:
+            results = [{'success': False, 'error': str(e)}] * len(pending)
         except Exception as e:
-            print(f"Error indexing batch {i // batch_size}: {e}")
+            # Timeouts, dropped connections, 5xx: the whole batch may be resent.
+            results = [{'success': False, 'error': str(e), 'code': 503}] * len(pending)
+        retry = []
+        for doc, result in zip(pending, results):
+            if result.get('success'):
+                imported += 1
+            elif result.get('code') in RETRY_CODES and attempt < retries:
+                retry.append(doc)
+            else:
+                errors.append(
+                    {'id': doc['id'], 'path': doc['path'], 'error': result.get('error', '')}
+                )
+        if not retry:
+            break
+        time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        pending = retry
+    return imported, errors
+
+
+def import_documents(
+    client: typesense.Client,
+    collection_name: str,
+    docs: Iterable[dict],
+    batch_size: int = 100,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+) -> dict:
+    """Stream ``docs`` into the collection, ``concurrency`` batches at a time.
+
+    Batches go out as they fill while later notes are still being parsed.
+    Parsing waits whenever every sender is busy, so at most ``concurrency``
+    batches are held in memory.
+    """
+    collection = client.collections[collection_name]
+    stats: dict = {'sent': 0, 'imported': 0, 'failed': 0, 'errors': []}
+    start = time.perf_counter()
+
+    def collect(done) -> None:
+        for future in done:
+            imported, errors = future.result()
+            stats['imported'] += imported
+            stats['failed'] += len(errors)
+            stats['errors'].extend(errors[:MAX_REPORTED_ERRORS - len(stats['errors'])])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending: set = set()
+        for batch in iter_batches(docs, batch_size):
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(import_batch, collection, batch, retries))
+            stats['sent'] += len(batch)
+        collect(wait(pending).done)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def print_import_stats(stats: dict) -> None:
+    rate = stats['imported'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(
+        f"Imported {stats['imported']} of {stats['sent']} documents in "
+        f"{stats['seconds']:.1f}s ({rate:.0f} docs/s), {stats['failed']} failed"
+    )
+    for error in stats['errors']:
+        print(f"  {error['path']} [{error['id']}]: {error['error']}")
+    if stats['failed'] > len(stats['errors']):
+        print(f"  ... and {stats['failed'] - len(stats['errors'])} more")
+
 
-    print(f"Indexed {len(all_docs)} chunks from {len(files)} files")
+def delete_documents(client: typesense.Client, collection_name: str, ids: List[str]) -> None:
+    collection = client.collections[collection_name]
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        batch = ids[i:i + DELETE_BATCH_SIZE]
+        collection.documents.delete({'filter_by': f"id:[{','.join(batch)}]"})
+
+
+def sync_documents(
+    client: typesense.Client,
+    collection_name: str,
+    batch_size: int = 100,
+    workers: Optional[int] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    paths: Optional[List[Path]] = None,
+) -> dict:
+    """Upsert new and changed chunks, and delete chunks that no longer exist.
+
+    The collection stays searchable throughout; an unchanged KB sends nothing.
+    With ``paths`` (absolute note paths, existing or deleted), only those
+    notes are parsed and compared.
+    """
+    rel_paths = None
+    if paths is not None:
+        rel_paths = [str(path.relative_to(KB_ROOT)) for path in paths]
+    indexed = indexed_hashes(client, collection_name, rel_paths)
+    current = set()
+
+    def changed_documents() -> Iterator[dict]:
+        for doc in iter_documents(workers, paths):
+            current.add(doc['id'])
+            if indexed.get(doc['id']) != doc['content_hash']:
+                yield doc
+
+    stats = import_documents(
+        client, collection_name, changed_documents(), batch_size, concurrency, retries
+    )
+    stale = [doc_id for doc_id in indexed if doc_id not in current]
+    delete_documents(client, collection_name, stale)
+    stats.update(
+        chunks=len(current), deleted=len(stale), unchanged=len(current) - stats['sent']
+    )
+    return stats
+
+
+def rebuild_collection(
+    client: typesense.Client,
+    alias: str,
+    batch_size: int = 100,
+    workers: Optional[int] = None,
+    keep_versions: int = DEFAULT_KEEP_VERSIONS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+) -> str:
+    """Index into a new versioned collection, then point ``alias`` at it.
+
+    Readers keep using the previous version until the alias moves, and the
+    alias only moves once every chunk is in the new collection.
+    """
+    while True:
+        name = version_name(alias)
+        try:
+            create_schema(client, name)
+            break
+        except typesense.exceptions.ObjectAlreadyExists:
+            continue  # another rebuild took this name; the clock has moved on
+    stats = import_documents(
+        client, name, iter_documents(workers), batch_size, concurrency, retries
+    )
+    print_import_stats(stats)
+    expected = stats['sent']
+    indexed = client.collections[name].retrieve()['num_documents']
+    if indexed != expected:
+        client.collections[name].delete()
+        raise RuntimeError(
+            f"{name} has {indexed} of {expected} chunks; "
+            f"dropped it and left {alias} unchanged"
+        )
+
+    if alias_target(client, alias) is None and collection_exists(client, alias):
+        # One-time migration from a plain collection named like the alias.
+        client.collections[alias].delete()
+        print(f"Deleted unversioned collection: {alias}")
+    client.aliases.upsert(alias, {'collection_name': name})
+    print(f"Alias {alias} -> {name}")
+
+    versions = [v for v in collection_versions(client, alias) if v != name]
+    stale = versions[:max(len(versions) - keep_versions, 0)]
+    for old in stale:
+        client.collections[old].delete()
+        print(f"Deleted old version: {old}")
+    return name
 
 
 def parse_args() -> argparse.Namespace:
@@ -219,32 +414,46 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Index KB into Typesense for full-text search."
     )
+    add_connection_arguments(parser)
     parser.add_argument(
-        "--host",
-        default=os.getenv("TYPESENSE_HOST", "localhost"),
-        help="Typesense host (default: localhost or TYPESENSE_HOST env var)"
+        "--collection",
+        default="kb_chunks",
+        help="Alias searched by search_typesense.py (default: kb_chunks)"
     )
     parser.add_argument(
-        "--port",
+        "--batch-size",
         type=int,
-        default=int(os.getenv("TYPESENSE_PORT", "8108")),
-        help="Typesense port (default: 8108 or TYPESENSE_PORT env var)"
+        default=100,
+        help="Batch size for indexing (default: 100)"
     )
     parser.add_argument(
-        "--api-key",
-        default=os.getenv("TYPESENSE_API_KEY", "xyz"),
-        help="Typesense API key (default: xyz or TYPESENSE_API_KEY env var)"
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for reading and chunking notes (0 = in-process)"
     )
     parser.add_argument(
-        "--collection",
-        default="kb_chunks",
-        help="Collection name (default: kb_chunks)"
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Import batches sent in parallel (default: {DEFAULT_CONCURRENCY})"
     )
     parser.add_argument(
-        "--batch-size",
+        "--retries",
         type=int,
-        default=100,
-        help="Batch size for indexing (default: 100)"
+        default=DEFAULT_RETRIES,
+        help=f"Resends of documents failing with transient errors (default: {DEFAULT_RETRIES})"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Re-import everything into a new collection version and swap the alias"
+    )
+    parser.add_argument(
+        "--keep-versions",
+        type=int,
+        default=DEFAULT_KEEP_VERSIONS,
+        help=f"Old versions kept after --rebuild (default: {DEFAULT_KEEP_VERSIONS})"
     )
     return parser.parse_args()
 
@@ -255,9 +464,37 @@ def main() -> None:
     args = parse_args()
 
     with suppress_typesense_warnings():
-        client = create_client(args.host, args.port, args.api_key)
-        create_schema(client, args.collection)
-        index_documents(client, args.collection, args.batch_size)
+        client = client_from_args(args)
+        if args.rebuild or not collection_exists(client, args.collection):
+            try:
+                rebuild_collection(
+                    client,
+                    args.collection,
+                    args.batch_size,
+                    args.workers,
+                    args.keep_versions,
+                    args.concurrency,
+                    args.retries,
+                )
+            except RuntimeError as e:
+                raise SystemExit(f"Rebuild failed: {e}")
+        else:
+            # Syncs whichever collection the alias points at.
+            stats = sync_documents(
+                client,
+                args.collection,
+                args.batch_size,
+                args.workers,
+                args.concurrency,
+                args.retries,
+            )
+            if stats['sent']:
+                print_import_stats(stats)
+            print(
+                f"Synced {stats['chunks']} chunks: {stats['imported']} upserted, "
+                f"{stats['deleted']} deleted, {stats['unchanged']} unchanged"
+                + (f", {stats['failed']} failed" if stats['failed'] else "")
+            )
 
     print(f"\nIndex complete. Query at http://{args.host}:{args.port}")
 
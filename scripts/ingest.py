@@ -0,0 +1,466 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Stdlib only: pool workers import this module, and must not pay for
+# torch/faiss/typesense imports just to read markdown.
+
+DEFAULT_WORKERS = int(os.getenv("KB_INGEST_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Below this many files a pool costs more to start than it saves.
+SERIAL_THRESHOLD = 64
+# Files per pool task; with at most two tasks per worker in flight, a slow
+# consumer holds a bounded number of parsed files whatever the KB size.
+MAX_TASK_FILES = 64
+
+# Chunk budgets, in the encoder's word-piece tokens (see count_tokens).
+# all-MiniLM-L6-v2 truncates its input at 256 tokens, so text past that
+# was never embedded; the margin covers [CLS]/[SEP].
+DEFAULT_MAX_TOKENS = int(os.getenv("KB_CHUNK_MAX_TOKENS", "240"))
+# Smaller sections (e.g. the empty "## Steps" of a fresh capture_note.py
+# skeleton) are merged into a neighbour instead of taking an index slot.
+DEFAULT_MIN_TOKENS = int(os.getenv("KB_CHUNK_MIN_TOKENS", "48"))
+# Tokens repeated from the end of one piece of a split section at the
+# start of the next, so a sentence cut at the boundary stays searchable.
+DEFAULT_OVERLAP_TOKENS = int(os.getenv("KB_CHUNK_OVERLAP_TOKENS", "32"))
+# Tokens are counted with this model's tokenizer (a Hugging Face model name
+# or a local model directory; the default encoder's) when the tokenizers
+# package and the model's tokenizer.json are available; "" always uses
+# estimate_tokens().
+CHUNK_TOKENIZER = os.getenv(
+    "KB_CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2"
+)
+
+_HEADING = re.compile(r"(#{1,6})(?:\s+|$)(.*)")
+# A fence opens with 3+ backticks or tildes and closes only with at least
+# as many of the same character on a line of its own (CommonMark).
+_FENCE = re.compile(r"\s*(`{3,}|~{3,})(.*)")
+_WORD_PIECE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    metadata: dict = field(default_factory=dict)
+    # (heading, text) per chunk, from chunk_markdown().
+    chunks: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class _Piece:
+    heading: str
+    context: str
+    body: str
+    tokens: int
+
+    @property
+    def text(self) -> str:
+        return f"{self.context}\n\n{self.body}" if self.context else self.body
+
+
+def strip_frontmatter(text: str) -> tuple[str, dict]:
+    """Strip YAML frontmatter and return content + metadata."""
+    if not text.startswith("---"):
+        return text, {}
+
+    parts = text.split("---", 2)
+    if len(parts) < 3:
+        return text, {}
+
+    frontmatter_raw = parts[1].strip()
+    content = parts[2].lstrip("\n")
+
+    # Parse YAML frontmatter fields
+    metadata = {}
+    lines = frontmatter_raw.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        if line.startswith("tags:"):
+            tags_part = line.replace("tags:", "").strip()
+            if tags_part.startswith("[") and tags_part.endswith("]"):
+                # Bracket array in frontmatter, e.g. tags: [pandoc, docx]
+                # Try JSON first (["pandoc","docx"]), then YAML-like ([pandoc, docx]).
+                try:
+                    metadata["tags"] = json.loads(tags_part)
+                except json.JSONDecodeError:
+                    inner = tags_part[1:-1].strip()
+                    metadata["tags"] = [t.strip().strip("'\"") for t in inner.split(",") if t.strip()]
+                i += 1
+            elif tags_part:
+                # Inline comma-separated: tags: pandoc, docx
+                metadata["tags"] = [t.strip() for t in tags_part.split(",")]
+                i += 1
+            else:
+                # YAML list format with hyphens on next lines
+                tags = []
+                i += 1
+                while i < len(lines) and lines[i].strip().startswith("-"):
+                    tag = lines[i].strip()[1:].strip()  # Remove hyphen and whitespace
+                    if tag:
+                        tags.append(tag)
+                    i += 1
+                metadata["tags"] = tags
+        elif line.startswith("created:"):
+            metadata["created"] = line.replace("created:", "").strip()
+            i += 1
+        elif line.startswith("updated:"):
+            metadata["updated"] = line.replace("updated:", "").strip()
+            i += 1
+        elif line.startswith("title:"):
+            metadata["title"] = line.replace("title:", "").strip()
+            i += 1
+        elif line.startswith("type:"):
+            metadata["type"] = line.replace("type:", "").strip()
+            i += 1
+        elif line.startswith("domain:"):
+            metadata["domain"] = line.replace("domain:", "").strip()
+            i += 1
+        elif line.startswith("status:"):
+            metadata["status"] = line.replace("status:", "").strip()
+            i += 1
+        else:
+            i += 1
+
+    return content, metadata
+
+
+def iter_markdown_files(root: Path) -> Iterable[Path]:
+    """Iterate over all markdown files in the knowledge directory."""
+    for path in root.rglob("*.md"):
+        if path.name.startswith("_"):
+            continue
+        yield path
+
+
+@lru_cache(maxsize=None)
+def _tokenizer():
+    """CHUNK_TOKENIZER's fast tokenizer, or None when it cannot be loaded."""
+    if not CHUNK_TOKENIZER:
+        return None
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        return None
+    path = Path(CHUNK_TOKENIZER) / "tokenizer.json"
+    if not path.is_file():
+        # Only a model already in the local Hugging Face cache; chunking
+        # never downloads anything.
+        try:
+            from huggingface_hub import try_to_load_from_cache
+        except ImportError:
+            return None
+        cached = try_to_load_from_cache(CHUNK_TOKENIZER, "tokenizer.json")
+        if not isinstance(cached, str):
+            return None
+        path = Path(cached)
+    try:
+        tokenizer = Tokenizer.from_file(str(path))
+    except Exception:
+        return None
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Tokens the encoder makes of ``text``, without [CLS]/[SEP].
+
+    Exact with the model's tokenizer (see CHUNK_TOKENIZER). Without it this
+    is only an estimate: estimate_tokens() plus a quarter, since the
+    heuristic undercounts identifiers and rare words.
+    """
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return (5 * estimate_tokens(text) + 3) // 4
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+@lru_cache(maxsize=None)
+def chunker_id() -> str:
+    """Chunk settings and token counter; indexes re-chunk every note when it changes."""
+    tokenizer = _tokenizer()
+    counter = f"tok:{CHUNK_TOKENIZER}" if tokenizer is not None else "estimate"
+    return (
+        f"v3-{counter}-{DEFAULT_MAX_TOKENS}-{DEFAULT_MIN_TOKENS}-{DEFAULT_OVERLAP_TOKENS}"
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough word pieces a BERT-style tokenizer makes of ``text``.
+
+    Stdlib only: punctuation is one piece per character, numbers about one
+    per three digits, words one per eight letters and non-ASCII words one
+    per character. Counts add up over whitespace-separated parts. Real
+    tokenizers split rare words and identifiers finer, so this can come
+    out low; see count_tokens().
+    """
+    count = 0
+    for match in _WORD_PIECE.finditer(text):
+        piece = match.group(0)
+        if not piece.isascii():
+            count += len(piece)
+        elif piece[0].isdigit():
+            count += (len(piece) + 2) // 3
+        else:
+            count += 1 + len(piece) // 8
+    return count
+
+
+def split_sections(content: str) -> List[Tuple[int, str, List[str], str]]:
+    """Split markdown on ATX headings outside code fences.
+
+    Returns (level, heading, ancestor headings, text) per section; text
+    starts with the heading line. Text before the first heading is a
+    level-0 section named "Document".
+    """
+    sections: List[Tuple[int, str, List[str], str]] = []
+    path: List[Tuple[int, str]] = []
+    level, heading = 0, "Document"
+    lines: List[str] = []
+    fence = ""  # marker of the open code fence, if any
+
+    def flush() -> None:
+        text = "\n".join(lines).strip()
+        if text:
+            ancestors = [h for lvl, h in path if lvl < level]
+            sections.append((level, heading, ancestors, text))
+
+    for line in content.splitlines():
+        marker = _FENCE.match(line)
+        if marker and not fence:
+            # Backtick fences cannot have backticks in their info string.
+            if not (marker.group(1)[0] == "`" and "`" in marker.group(2)):
+                fence = marker.group(1)
+        elif (
+            marker
+            and fence
+            and marker.group(1)[0] == fence[0]
+            and len(marker.group(1)) >= len(fence)
+            and not marker.group(2).strip()
+        ):
+            fence = ""
+        match = None if fence else _HEADING.match(line)
+        if match:
+            flush()
+            path = [(lvl, h) for lvl, h in path if lvl < level] + [(level, heading)]
+            path = [(lvl, h) for lvl, h in path if lvl > 0]
+            level = len(match.group(1))
+            heading = match.group(2).strip().rstrip("#").strip() or "Document"
+            lines = [line]
+        else:
+            lines.append(line)
+    flush()
+    return sections
+
+
+def _units(text: str, budget: int) -> List[Tuple[str, str, int]]:
+    """(separator, text, tokens) pieces of at most ``budget`` tokens each.
+
+    Paragraphs are kept whole where they fit, else split into lines, else
+    into words; a single word over budget is cut into character runs.
+    """
+    units: List[Tuple[str, str, int]] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = paragraph.strip("\n")
+        if not paragraph.strip():
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= budget:
+            units.append(("\n\n", paragraph, tokens))
+            continue
+        sep = "\n\n"
+        for line in paragraph.splitlines():
+            tokens = count_tokens(line)
+            if tokens <= budget:
+                units.append((sep, line, tokens))
+                sep = "\n"
+                continue
+            for word in line.split():
+                for part, tokens in _word_parts(word, budget):
+                    units.append((sep, part, tokens))
+                    sep = " "
+            sep = "\n"
+    return units
+
+
+def _word_parts(word: str, budget: int) -> List[Tuple[str, int]]:
+    """(text, tokens) runs of ``word``, halved until each fits ``budget``.
+
+    Characters can cost more than one token each (e.g. CJK or symbols
+    under estimate_tokens), so runs are measured, not cut by length.
+    """
+    tokens = count_tokens(word)
+    if tokens <= budget or len(word) == 1:
+        return [(word, tokens)]
+    middle = len(word) // 2
+    return _word_parts(word[:middle], budget) + _word_parts(word[middle:], budget)
+
+
+def _tail(text: str, tokens: int) -> str:
+    """The last whole words of ``text`` that fit in ``tokens``."""
+    words = text.split()
+    used = 0
+    start = len(words)
+    while start > 0 and used + count_tokens(words[start - 1]) <= tokens:
+        start -= 1
+        used += count_tokens(words[start])
+    return " ".join(words[start:])
+
+
+def _windows(units: List[Tuple[str, str, int]], budget: int, overlap: int) -> List[str]:
+    """Pack units into texts of at most ``budget`` tokens.
+
+    Each window after the first starts with up to ``overlap`` tokens from
+    the end of the previous one: whole units where they fit, else the
+    last words of the final unit.
+    """
+    windows = []
+    start = 0
+    carry, carry_tokens = "", 0
+    while start < len(units):
+        if carry_tokens + units[start][2] > budget:
+            carry, carry_tokens = "", 0
+        end, used = start, carry_tokens
+        while end < len(units) and (end == start or used + units[end][2] <= budget):
+            used += units[end][2]
+            end += 1
+        text = units[start][1] + "".join(sep + t for sep, t, _ in units[start + 1:end])
+        windows.append(f"{carry}{units[start][0]}{text}" if carry else text)
+        if end == len(units):
+            break
+        back, carried = end, 0
+        while back - 1 > start and carried + units[back - 1][2] <= overlap:
+            back -= 1
+            carried += units[back][2]
+        carry, carry_tokens = "", 0
+        if back == end and overlap > 0:
+            carry = _tail(units[end - 1][1], overlap)
+            carry_tokens = count_tokens(carry)
+        start = back
+    return windows
+
+
+def chunk_markdown(
+    content: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    min_tokens: int = DEFAULT_MIN_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[Tuple[str, str]]:
+    """(heading, text) chunks of roughly ``min_tokens``..``max_tokens`` tokens.
+
+    Each section becomes one chunk when it fits. A longer one is split at
+    paragraph, line or word boundaries into overlapping pieces, each
+    repeating the section's heading line. Chunks below ``min_tokens`` are
+    merged into the next chunk of the note, else into the previous one,
+    while the result still fits. Chunks of subsections start with their
+    heading path, e.g. "Note title > Steps", for context; a heading with
+    no text of its own before its first subsection only appears there.
+    """
+    sections = split_sections(content)
+    pieces: List[_Piece] = []
+    for i, (level, heading, ancestors, text) in enumerate(sections):
+        if (
+            level
+            and "\n" not in text
+            and i + 1 < len(sections)
+            and sections[i + 1][0] > level
+        ):
+            continue
+        context = " > ".join(ancestors)
+        context_tokens = count_tokens(context)
+        tokens = context_tokens + count_tokens(text)
+        if tokens <= max_tokens:
+            pieces.append(_Piece(heading, context, text, tokens))
+            continue
+        heading_line, _, body = text.partition("\n") if level else ("", "", text)
+        head = "\n\n".join(p for p in (context, heading_line) if p)
+        head_tokens = count_tokens(head)
+        budget = max(1, max_tokens - head_tokens)
+        for window in _windows(_units(body, budget), budget, overlap_tokens):
+            tokens = head_tokens + count_tokens(window)
+            pieces.append(_Piece(heading, head, window, tokens))
+
+    forward: List[_Piece] = []
+    for piece in pieces:
+        last = forward[-1] if forward else None
+        if last and last.tokens < min_tokens and _fits(last, piece, max_tokens):
+            _absorb(last, piece)
+        else:
+            forward.append(piece)
+    merged: List[_Piece] = []
+    for piece in forward:
+        last = merged[-1] if merged else None
+        if last and piece.tokens < min_tokens and _fits(last, piece, max_tokens):
+            _absorb(last, piece)
+        else:
+            merged.append(piece)
+    return [(piece.heading, piece.text) for piece in merged]
+
+
+def _shared_context(first: _Piece, second: _Piece) -> bool:
+    # A sibling or child of ``first`` needs no heading path once merged into it.
+    own_path = " > ".join(p for p in (first.context, first.heading) if p)
+    return second.context in ("", first.context, own_path)
+
+
+def _fits(first: _Piece, second: _Piece, max_tokens: int) -> bool:
+    added = second.tokens
+    if _shared_context(first, second):
+        added -= count_tokens(second.context)
+    return first.tokens + added <= max_tokens
+
+
+def _absorb(first: _Piece, second: _Piece) -> None:
+    addition = second.body if _shared_context(first, second) else second.text
+    first.body = f"{first.body}\n\n{addition}"
+    first.tokens += count_tokens(addition)
+
+
+def parse_file(path: Path, kb_root: Path) -> ParsedFile:
+    raw = path.read_text(encoding="utf-8")
+    content, metadata = strip_frontmatter(raw)
+    return ParsedFile(
+        path=str(path.relative_to(kb_root)),
+        metadata=metadata,
+        chunks=chunk_markdown(content),
+    )
+
+
+def parse_files(paths: List[Path], kb_root: Path) -> List[ParsedFile]:
+    return [parse_file(path, kb_root) for path in paths]
+
+
+def iter_parsed_files(
+    paths: Iterable[Path], kb_root: Path, workers: Optional[int] = None
+) -> Iterator[ParsedFile]:
+    """Parse ``paths`` across a process pool, yielding results in input order.
+
+    ``workers`` of 0 or 1 (or a small batch of files) parses in-process.
+    """
+    paths = list(paths)
+    workers = DEFAULT_WORKERS if workers is None else workers
+    parse = partial(parse_file, kb_root=kb_root)
+    if workers <= 1 or len(paths) < SERIAL_THRESHOLD:
+        yield from map(parse, paths)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    from collections import deque
+
+    chunksize = min(MAX_TASK_FILES, max(1, len(paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # executor.map() would queue every file up front and buffer results
+        # the consumer has not reached yet.
+        pending: deque = deque()
+        for i in range(0, len(paths), chunksize):
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(parse_files, paths[i:i + chunksize], kb_root))
+        while pending:
+            yield from pending.popleft().result()
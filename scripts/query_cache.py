@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# One SQLite file under .kb_index holds both caches:
+#   embeddings: (model key, normalised query) -> float32 query vector
+#   results:    (index version, search key) -> JSON result list
+# Each table is bounded and evicts least recently used rows. Results are
+# only ever looked up under the current index version, and rows from older
+# versions are dropped on the next write.
+DEFAULT_EMBEDDING_ENTRIES = int(os.getenv("KB_QUERY_CACHE_SIZE", "10000"))
+DEFAULT_RESULT_ENTRIES = int(os.getenv("KB_RESULT_CACHE_SIZE", "1000"))
+COUNTERS = ("embedding_hits", "embedding_misses", "result_hits", "result_misses")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    query TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (model, query)
+);
+CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings(used);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    results TEXT NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results(used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Case, width and whitespace variants of a query share one cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def model_key(model_name: str, backend: str) -> str:
+    # Backends of one model (e.g. torch vs onnx-int8) embed slightly differently.
+    return f"{model_name}|{backend}"
+
+
+class QueryCache:
+    """Persistent LRU caches of query embeddings and search results."""
+
+    def __init__(
+        self,
+        path: Path,
+        max_embeddings: int = DEFAULT_EMBEDDING_ENTRIES,
+        max_results: int = DEFAULT_RESULT_ENTRIES,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_embeddings = max_embeddings
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=5, check_same_thread=False)
+        # A lost write only costs a re-encode, so skip fsyncs.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.executescript(SCHEMA)
+        self.session = dict.fromkeys(COUNTERS, 0)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def _count(self, name: str) -> None:
+        self.session[name] += 1
+        self._conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _evict(self, table: str, limit: int) -> None:
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} "
+            f"ORDER BY used LIMIT max(0, (SELECT count(*) FROM {table}) - ?))",
+            (limit,),
+        )
+
+    def get_embeddings(
+        self, model: str, queries: List[str]
+    ) -> List[Optional[np.ndarray]]:
+        """Cached vector (1-D float32) per query, None where missing."""
+        import numpy as np
+
+        vectors: List[Optional[np.ndarray]] = []
+        with self._lock:
+            now = time.time_ns()
+            for query in queries:
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND query = ?",
+                    (model, query),
+                ).fetchone()
+                if row is None:
+                    self._count("embedding_misses")
+                    vectors.append(None)
+                    continue
+                self._count("embedding_hits")
+                self._conn.execute(
+                    "UPDATE embeddings SET used = ? WHERE model = ? AND query = ?",
+                    (now, model, query),
+                )
+                vectors.append(np.frombuffer(row[0], dtype="float32"))
+            self._conn.commit()
+        return vectors
+
+    def put_embeddings(
+        self, model: str, queries: List[str], vectors: np.ndarray
+    ) -> None:
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        now = time.time_ns()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(model, query, vector, used) "
+                "VALUES (?, ?, ?, ?)",
+                [(model, q, v.tobytes(), now) for q, v in zip(queries, vectors)],
+            )
+            self._evict("embeddings", self.max_embeddings)
+            self._conn.commit()
+
+    def get_results(self, version: str, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results FROM results WHERE key = ? AND version = ?",
+                (key, version),
+            ).fetchone()
+            if row is None:
+                self._count("result_misses")
+                self._conn.commit()
+                return None
+            self._count("result_hits")
+            self._conn.execute(
+                "UPDATE results SET used = ? WHERE key = ?", (time.time_ns(), key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put_results(self, version: str, key: str, results: List[dict]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE version != ?", (version,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results(key, version, results, used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, version, json.dumps(results), time.time_ns()),
+            )
+            self._evict("results", self.max_results)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit rates for this session and over the cache file's lifetime."""
+        with self._lock:
+            stored = dict(self._conn.execute("SELECT name, value FROM counters"))
+            sizes = {
+                "embeddings": self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0],
+                "results": self._conn.execute("SELECT count(*) FROM results").fetchone()[0],
+            }
+            session = dict(self.session)
+
+        def rates(counts: dict) -> dict:
+            out = {}
+            for kind in ("embedding", "result"):
+                hits, misses = counts.get(f"{kind}_hits", 0), counts.get(f"{kind}_misses", 0)
+                out[kind] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                }
+            return out
+
+        return {"session": rates(session), "lifetime": rates(stored), "entries": sizes}
+
+
+class CachedQueryEncoder:
+    """Encodes queries through the cache, loading the model on the first miss.
+
+    Only the cache key is normalised (see normalize_query); the model
+    always sees the query as typed, so a variant reuses the vector of the
+    spelling that was encoded first.
+    """
+
+    def __init__(self, load_model: Callable, key: str, cache: Optional[QueryCache]) -> None:
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.key = key
+        self.cache = cache
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def encode_queries(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """One row per query; all cache misses are encoded in a single pass."""
+        import numpy as np
+
+        if self.cache is not None:
+            keys = [normalize_query(q) for q in queries]
+            vectors = self.cache.get_embeddings(self.key, keys)
+        else:
+            keys = list(queries)
+            vectors = [None] * len(keys)
+        # First spelling of each missing key; variants in the batch share it.
+        missing: Dict[str, str] = {}
+        for query, key, vector in zip(queries, keys, vectors):
+            if vector is None:
+                missing.setdefault(key, query)
+        if missing:
+            encoded = np.asarray(
+                self.model.encode(
+                    list(missing.values()),
+                    batch_size=batch_size,
+                    normalize_embeddings=True,
+                ),
+                dtype="float32",
+            )
+            if self.cache is not None:
+                self.cache.put_embeddings(self.key, list(missing), encoded)
+            by_key = dict(zip(missing, encoded))
+            vectors = [by_key[k] if v is None else v for k, v in zip(keys, vectors)]
+        return np.vstack(vectors).astype("float32", copy=False)
@@ -1,24 +1,93 @@
+from __future__ import annotations
+
 import argparse
 import json
 import hashlib
 import os
-from dataclasses import dataclass
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
 
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+    from scripts.chunk_store import ChunkStore
 
+# faiss, numpy, tqdm and the encoder (torch) are imported inside the
+# functions that need them: --help, argument errors and searches answered
+# by search_server.py never pay for them. Check with startup_profile.py.
 
 KB_ROOT = Path(__file__).resolve().parents[1]
 KNOWLEDGE_DIR = KB_ROOT / "knowledge"
 INDEX_DIR = KB_ROOT / ".kb_index"
 INDEX_PATH = INDEX_DIR / "index.faiss"
-META_PATH = INDEX_DIR / "metadata.json"
+CHUNKS_PATH = INDEX_DIR / "chunks.idx"
+# Replaced by the chunk store; only kept so rebuilds can delete it.
+LEGACY_META_PATH = INDEX_DIR / "metadata.json"
 CACHE_DIR = INDEX_DIR / "cache"
 CACHE_INDEX = INDEX_DIR / "cache_index.json"
+INDEX_VERSION_PATH = INDEX_DIR / "index_version"
+INDEX_PARAMS_PATH = INDEX_DIR / "index_params.json"
+FACETS_PATH = INDEX_DIR / "facets.json"
+QUERY_CACHE_PATH = INDEX_DIR / "query_cache.sqlite"
+DEFAULT_BATCH_SIZE = 64
+# --queries searches this many queries per encode pass and index.search call.
+QUERY_BATCH_SIZE = 256
+
+sys.path.insert(0, str(KB_ROOT))
+
+from scripts.ann_index import (  # noqa: E402
+    DEFAULT_STORAGE,
+    ENGINES,
+    REMOVABLE_ENGINES,
+    STORAGES,
+    build_engine,
+    choose_engine,
+    default_params,
+    id_selector,
+    load_params,
+    remove_ids,
+    save_params,
+    search_parameters,
+    search_subset,
+)
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, load_encoder  # noqa: E402
+from scripts.filters import (  # noqa: E402
+    FilterError,
+    build_facets,
+    facet_arrays,
+    facet_metadata,
+    parse_filter,
+    select_ids,
+)
+from scripts.ingest import (  # noqa: E402
+    ParsedFile,
+    chunker_id,
+    iter_markdown_files,
+    iter_parsed_files,
+    parse_file,
+)
+from scripts.query_cache import (  # noqa: E402
+    CachedQueryEncoder,
+    QueryCache,
+    model_key,
+    normalize_query,
+)
 
 
 @dataclass
@@ -26,63 +95,32 @@ class Chunk:
     text: str
     path: str
     heading: str
+    # Filterable frontmatter (domain, type, status, tags) of the note.
+    metadata: dict = field(default_factory=dict)
 
 
-def strip_frontmatter(text: str) -> str:
-    if not text.startswith("---"):
-        return text
-    parts = text.split("---", 2)
-    if len(parts) < 3:
-        return text
-    return parts[2].lstrip("\n")
-
-
-def iter_markdown_files(root: Path) -> Iterable[Path]:
-    for path in root.rglob("*.md"):
-        if path.name.startswith("_"):
-            continue
-        yield path
+def chunks_from_parsed(parsed: ParsedFile) -> List[Chunk]:
+    metadata = facet_metadata(parsed.metadata)
+    return [
+        Chunk(text=text, path=parsed.path, heading=heading, metadata=metadata)
+        for heading, text in parsed.chunks
+    ]
 
 
 def split_into_chunks(path: Path) -> List[Chunk]:
-    raw = path.read_text(encoding="utf-8")
-    content = strip_frontmatter(raw)
-    lines = content.splitlines()
-
-    chunks: List[Chunk] = []
-    current_heading = "Document"
-    current_lines: List[str] = []
+    return chunks_from_parsed(parse_file(path, KB_ROOT))
 
-    def flush():
-        if not current_lines:
-            return
-        text = "\n".join(current_lines).strip()
-        if text:
-            chunks.append(
-                Chunk(
-                    text=text,
-                    path=str(path.relative_to(KB_ROOT)),
-                    heading=current_heading,
-                )
-            )
-
-    for line in lines:
-        if line.startswith("#"):
-            flush()
-            current_heading = line.lstrip("#").strip() or "Document"
-            current_lines = [line]
-        else:
-            current_lines.append(line)
-
-    flush()
-    return chunks
 
+def load_corpus(workers: Optional[int] = None) -> List[Chunk]:
+    from tqdm import tqdm
 
-def load_corpus() -> List[Chunk]:
     chunks: List[Chunk] = []
     files = list(iter_markdown_files(KNOWLEDGE_DIR))
-    for path in tqdm(files, desc="Reading files", unit="file"):
-        chunks.extend(split_into_chunks(path))
+    parsed_files = iter_parsed_files(files, KB_ROOT, workers)
+    for parsed in tqdm(
+        parsed_files, total=len(files), desc="Reading files", unit="file"
+    ):
+        chunks.extend(chunks_from_parsed(parsed))
     return chunks
 
 
@@ -91,131 +129,661 @@ def file_hash(path: Path) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
-def safe_key(path: Path) -> str:
-    return str(path.relative_to(KB_ROOT)).replace("/", "__")
+def file_stat(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def git_head() -> Optional[str]:
+    result = subprocess.run(
+        ["git", "-C", str(KB_ROOT), "rev-parse", "HEAD"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
 
 
-def load_cache_index() -> dict:
+def git_changed_files(since: str) -> Optional[Set[str]]:
+    """KB-relative paths under knowledge/ changed since ``since``, incl. uncommitted."""
+    commands = [
+        ["diff", "--relative", "--name-only", since, "--", "knowledge"],
+        ["ls-files", "--others", "--exclude-standard", "--", "knowledge"],
+    ]
+    changed: Set[str] = set()
+    for args in commands:
+        result = subprocess.run(
+            ["git", "-C", str(KB_ROOT), "-c", "core.quotepath=off", *args],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if result.returncode != 0:
+            return None
+        changed.update(line for line in result.stdout.splitlines() if line)
+    return changed
+
+
+def load_cached_embeddings() -> np.ndarray:
+    from scripts.embedding_cache import EmbeddingCache
+
     if not CACHE_INDEX.exists():
-        return {"files": {}}
-    return json.loads(CACHE_INDEX.read_text(encoding="utf-8"))
+        raise FileNotFoundError("Embedding cache is empty. Run with --rebuild first.")
+    dim = json.loads(CACHE_INDEX.read_text(encoding="utf-8"))["dim"]
+    cache = EmbeddingCache(CACHE_DIR, CACHE_INDEX, dim)
+    return cache.embeddings(list(cache.files.values()))
+
+
+def chunk_metadata(chunk: Chunk) -> dict:
+    return {
+        "path": chunk.path,
+        "heading": chunk.heading,
+        "text": chunk.text,
+        **chunk.metadata,
+    }
+
+
+def write_facets(cache) -> None:
+    """Precompute field -> value -> chunk IDs for --filter from the cache."""
+    facets = build_facets(
+        (entry["ids"], entry.get("metadata", {})) for entry in cache.files.values()
+    )
+    atomic_write_text(FACETS_PATH, json.dumps(facets))
+
+
+def load_facets() -> dict:
+    if not FACETS_PATH.exists():
+        raise FileNotFoundError("Filter facets not found. Run with --rebuild first.")
+    return facet_arrays(json.loads(FACETS_PATH.read_text(encoding="utf-8")))
+
+
+class FilterSelectors:
+    """Facets of a loaded index, with one FAISS ID selector cached per filter."""
+
+    MAX_CACHED = 256
+
+    def __init__(self, facets: dict) -> None:
+        self.facets = facets
+        self._cache: dict = {}
+        # Server threads share one instance.
+        self._lock = threading.Lock()
+
+    def get(self, filter_by: str):
+        """ID selector for ``filter_by``, or None when no chunk matches it."""
+        with self._lock:
+            if filter_by in self._cache:
+                return self._cache[filter_by]
+        ids = select_ids(parse_filter(filter_by), self.facets)
+        selector = id_selector(ids) if ids.size else None
+        with self._lock:
+            if len(self._cache) >= self.MAX_CACHED:
+                self._cache.clear()
+            self._cache[filter_by] = selector
+        return selector
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
 
+def read_index_version() -> Optional[str]:
+    if not INDEX_VERSION_PATH.exists():
+        return None
+    return INDEX_VERSION_PATH.read_text(encoding="utf-8").strip() or None
 
-def save_cache_index(index: dict) -> None:
-    CACHE_INDEX.write_text(json.dumps(index, indent=2), encoding="utf-8")
 
+def bump_index_version() -> str:
+    # Written last so readers (e.g. search_server.py) only see a new version
+    # once the index and metadata it describes are both in place.
+    version = str(time.time_ns())
+    atomic_write_text(INDEX_VERSION_PATH, version)
+    return version
 
-def build_index(model: SentenceTransformer) -> None:
+
+def encode_chunks(
+    model: SentenceTransformer, texts: List[str], batch_size: int = DEFAULT_BATCH_SIZE
+) -> np.ndarray:
+    """Encode in length-sorted batches (less padding); rows keep input order."""
+    import numpy as np
+
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype="float32")
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    encoded = model.encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        show_progress_bar=len(texts) > batch_size,
+    )
+    embeddings = np.empty_like(np.asarray(encoded, dtype="float32"))
+    embeddings[order] = encoded
+    return embeddings
+
+
+def embed_chunks(
+    model: SentenceTransformer,
+    cache,
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Tuple[np.ndarray, List[str], int]:
+    """Embeddings and chunk hashes for ``texts``, plus how many were encoded.
+
+    Only texts the cache holds no vector for are encoded, each once, so an
+    edit re-embeds just the chunks it touched and duplicated chunks (in
+    this batch or in other notes) share one encode.
+    """
+    import numpy as np
+
+    from scripts.embedding_cache import chunk_hash
+
+    hashes = [chunk_hash(text) for text in texts]
+    known = cache.chunk_rows() if texts else {}
+    todo: dict = {}
+    for h, text in zip(hashes, texts):
+        if h not in known:
+            todo.setdefault(h, text)
+    encoded = encode_chunks(model, list(todo.values()), batch_size)
+    encoded_row = {h: i for i, h in enumerate(todo)}
+
+    embeddings = np.empty((len(texts), cache.dim), dtype="float32")
+    reused = [i for i, h in enumerate(hashes) if h in known]
+    fresh = [i for i, h in enumerate(hashes) if h not in known]
+    embeddings[reused] = cache.rows_at([known[hashes[i]] for i in reused])
+    embeddings[fresh] = encoded.reshape(-1, cache.dim)[
+        [encoded_row[hashes[i]] for i in fresh]
+    ]
+    return embeddings, hashes, len(todo)
+
+
+def build_index(
+    model: SentenceTransformer,
+    index_type: Optional[str] = None,
+    incremental: bool = True,
+    git_changes: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: Optional[int] = None,
+    model_id: Optional[str] = None,
+    changed: Optional[Iterable[Path]] = None,
+    verbose: bool = True,
+    storage: Optional[str] = None,
+) -> dict:
+    """Bring the index up to date with knowledge/ and return rebuild stats.
+
+    ``model_id`` (see query_cache.model_key) scopes the embedding cache to
+    one model; switching models then re-embeds every chunk. ``changed``
+    lists the only notes that may have changed (e.g. from a file watcher):
+    other cached notes are reused without even a stat(). With ``verbose``
+    off only warnings are printed; the returned stats carry the rest.
+    ``index_type`` (an engine or "auto") and ``storage`` (see
+    ann_index.STORAGES) default to the current index's.
+    """
+    import faiss
+    import numpy as np
+    from tqdm import tqdm
+
+    from scripts.chunk_store import update_chunk_store, write_chunk_store
+    from scripts.embedding_cache import EmbeddingCache
+
+    log = print if verbose else (lambda *args, **kwargs: None)
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-    cache_index = load_cache_index()
-    new_index = {"files": {}}
+    current = load_params(INDEX_PARAMS_PATH) if INDEX_PARAMS_PATH.exists() else None
+    storage = storage or (current["storage"] if current else DEFAULT_STORAGE)
+    # Indexes from before index_type was recorded keep their engine.
+    index_type = index_type or (
+        current.get("index_type", current["engine"]) if current else "auto"
+    )
+    # Quantized indexes are rebuilt from a float16 cache: halving its size
+    # costs no measurable recall, while caching 8-bit codes would add a
+    # second rounding on every rebuild.
+    cache_dtype = "float32" if storage == "float32" else "float16"
+
+    dim = model.get_sentence_embedding_dimension()
+    cache = EmbeddingCache(
+        CACHE_DIR, CACHE_INDEX, dim, model_id, chunker_id(), dtype=cache_dtype
+    )
+    if cache.stale_chunks and cache.files:
+        print("Chunking settings changed; re-chunking every note")
+
+    # With git_changes, trust git for which notes changed since the last
+    # indexed commit and skip even the stat() of everything else. Notes that
+    # were uncommitted at that point are checked too: reverting them leaves
+    # no diff against the commit.
+    head = git_head()
+    dirty = git_changed_files(head) if head else None
+    candidates: Optional[Set[Path]] = None
+    if git_changes and cache.git_commit and cache.git_dirty is not None and head:
+        git_changed = git_changed_files(cache.git_commit)
+        if git_changed is not None:
+            candidates = {KB_ROOT / p for p in git_changed | set(cache.git_dirty)}
+    if git_changes and candidates is None:
+        print("No usable git history for the last index; checking every file")
+    if changed is not None:
+        candidates = set(changed) | (candidates or set())
+    # Chunk IDs are allocated from a counter that only moves forward, so an
+    # unchanged file keeps its IDs and edited files never collide with them.
+    first_new_id = cache.next_id
 
-    all_chunks: List[Chunk] = []
-    all_embeddings: List[np.ndarray] = []
+    new_chunks: dict = {}
+    new_embeddings: dict = {}
+    removed_ids: List[int] = []
     reused_files: List[str] = []
     rebuilt_files: List[str] = []
+    pending: List[Tuple[str, str, List[int]]] = []
+    changed_paths: List[Path] = []
 
     files = list(iter_markdown_files(KNOWLEDGE_DIR))
-    for path in tqdm(files, desc="Indexing files", unit="file"):
+    seen = set()
+    for path in tqdm(files, desc="Indexing files", unit="file", disable=not verbose):
         rel_path = str(path.relative_to(KB_ROOT))
-        key = safe_key(path)
+        seen.add(rel_path)
+        entry = None if cache.stale_chunks else cache.files.get(rel_path)
+        if entry and candidates is not None and path not in candidates:
+            reused_files.append(rel_path)
+            continue
+
+        # Only read and hash the file when its stat data moved.
+        stat = file_stat(path)
+        if entry and entry.get("stat") == stat:
+            reused_files.append(rel_path)
+            continue
         current_hash = file_hash(path)
+        if entry and cache.get(rel_path, current_hash):
+            cache.set_stat(rel_path, stat)
+            reused_files.append(rel_path)
+            continue
 
-        cache_entry = cache_index["files"].get(rel_path)
-        cache_meta_path = CACHE_DIR / f"{key}.json"
-        cache_emb_path = CACHE_DIR / f"{key}.npy"
+        old_entry = cache.files.get(rel_path)
+        if old_entry:
+            removed_ids.extend(old_entry["ids"])
+        pending.append((rel_path, current_hash, stat))
+        changed_paths.append(path)
 
-        if cache_entry and cache_entry["hash"] == current_hash:
-            meta = json.loads(cache_meta_path.read_text(encoding="utf-8"))
-            embeddings = np.load(cache_emb_path)
-            chunks = [Chunk(**c) for c in meta["chunks"]]
-            reused_files.append(rel_path)
-        else:
-            chunks = split_into_chunks(path)
-            texts = [c.text for c in chunks]
-            embeddings = model.encode(
-                texts, normalize_embeddings=True, show_progress_bar=False
-            )
-            embeddings = np.asarray(embeddings, dtype="float32")
-            cache_meta_path.write_text(
-                json.dumps(
-                    {"hash": current_hash, "chunks": [c.__dict__ for c in chunks]},
-                    indent=2,
-                ),
-                encoding="utf-8",
+    for parsed in iter_parsed_files(changed_paths, KB_ROOT, workers):
+        new_chunks[parsed.path] = chunks_from_parsed(parsed)
+
+    # Caches written before filters existed lack frontmatter; reading the
+    # unchanged notes again is enough, their embeddings stay valid.
+    backfill = [
+        KB_ROOT / rel_path
+        for rel_path in reused_files
+        if "metadata" not in cache.files[rel_path]
+    ]
+    backfilled_ids: List[int] = []
+    backfilled_meta: List[dict] = []
+    for parsed in iter_parsed_files(backfill, KB_ROOT, workers):
+        entry = cache.files[parsed.path]
+        entry["metadata"] = facet_metadata(parsed.metadata)
+        backfilled_ids.extend(entry["ids"])
+        backfilled_meta.extend([entry["metadata"]] * len(entry["ids"]))
+    backfilled = []
+    if backfilled_ids:
+        backfilled = [
+            (chunk_id, dict(record, **metadata))
+            for chunk_id, record, metadata in zip(
+                backfilled_ids, cache.chunks(backfilled_ids), backfilled_meta
             )
-            np.save(cache_emb_path, embeddings)
-            rebuilt_files.append(rel_path)
+        ]
+        cache.update_records(backfilled)
 
-        new_index["files"][rel_path] = {"hash": current_hash, "key": key}
-        all_chunks.extend(chunks)
-        all_embeddings.append(embeddings)
+    # Encode every new chunk in one pass instead of one tiny batch per file;
+    # chunks whose text is already cached (e.g. the untouched sections of an
+    # edited note) reuse their embedding.
+    texts = [c.text for chunks in new_chunks.values() for c in chunks]
+    start = time.perf_counter()
+    embeddings, hashes, encoded = embed_chunks(model, cache, texts, batch_size)
+    elapsed = time.perf_counter() - start
+    if encoded:
+        rate = encoded / elapsed if elapsed > 0 else float("inf")
+        log(f"Encoded {encoded} chunks in {elapsed:.1f}s ({rate:.1f} chunks/s)")
+    stats = {
+        "files_reused": len(reused_files),
+        "files_rebuilt": len(pending),
+        "files_deleted": 0,
+        "chunks": 0,
+        "chunks_embedded": encoded,
+        "chunks_reused": len(texts) - encoded,
+        "encode_seconds": elapsed,
+    }
 
-    for rel_path, entry in cache_index["files"].items():
-        if rel_path in new_index["files"]:
-            continue
-        key = entry["key"]
-        (CACHE_DIR / f"{key}.json").unlink(missing_ok=True)
-        (CACHE_DIR / f"{key}.npy").unlink(missing_ok=True)
+    offset = 0
+    for rel_path, current_hash, stat in pending:
+        chunks = new_chunks[rel_path]
+        new_embeddings[rel_path] = embeddings[offset:offset + len(chunks)]
+        chunk_hashes = hashes[offset:offset + len(chunks)]
+        offset += len(chunks)
+        records = [chunk_metadata(c) for c in chunks]
+        metadata = chunks[0].metadata if chunks else {}
+        cache.put(
+            rel_path,
+            current_hash,
+            records,
+            new_embeddings[rel_path],
+            metadata=metadata,
+            hashes=chunk_hashes,
+        )
+        cache.set_stat(rel_path, stat)
+        rebuilt_files.append(rel_path)
 
-    save_cache_index(new_index)
+    deleted_files = [p for p in cache.files if p not in seen]
+    for rel_path in deleted_files:
+        removed_ids.extend(cache.remove(rel_path)["ids"])
+    cache.git_commit = head if dirty is not None else None
+    cache.git_dirty = sorted(dirty) if dirty is not None else None
+    cache.save()
 
-    print(f"Reused files: {len(reused_files)}")
+    log(f"Reused files: {len(reused_files)}")
     if reused_files:
-        print("Reused:")
+        log("Reused:")
         for path in reused_files:
-            print(f"- {path}")
-    print(f"Rebuilt files: {len(rebuilt_files)}")
+            log(f"- {path}")
+    log(f"Rebuilt files: {len(rebuilt_files)}")
     if rebuilt_files:
-        print("Rebuilt:")
+        log("Rebuilt:")
         for path in rebuilt_files:
-            print(f"- {path}")
+            log(f"- {path}")
+    if deleted_files:
+        log(f"Deleted files: {len(deleted_files)}")
+    if texts:
+        log(
+            f"Chunks re-embedded: {stats['chunks_embedded']}, "
+            f"reused: {stats['chunks_reused']}"
+        )
 
-    dim = model.get_sentence_embedding_dimension()
-    if all_embeddings:
-        embeddings = np.vstack(all_embeddings)
-    else:
-        embeddings = np.zeros((0, dim), dtype="float32")
-    print(f"Chunks: {len(all_chunks)}")
+    total = sum(entry["count"] for entry in cache.files.values())
+    log(f"Chunks: {total}")
+    stats.update(files_deleted=len(deleted_files), chunks=total)
 
-    index = faiss.IndexFlatIP(embeddings.shape[1])
-    index.add(embeddings)
-    faiss.write_index(index, str(INDEX_PATH))
+    engine = choose_engine(total) if index_type == "auto" else index_type
+    # The index must have been built from exactly the cache state we started
+    # from; otherwise (e.g. an interrupted build, or a new model whose cache
+    # reset forgot the old chunk IDs) fall back to a full build.
+    can_update = (
+        incremental
+        and current is not None
+        and not cache.reset
+        and current["engine"] == engine
+        and current["storage"] == storage
+        and current.get("model") == model_id
+        and current.get("dim") == dim
+        and current.get("next_id") == first_new_id
+        and engine in REMOVABLE_ENGINES
+        and INDEX_PATH.exists()
+        and CHUNKS_PATH.exists()
+    )
 
-    metadata = [
-        {"path": c.path, "heading": c.heading, "text": c.text} for c in all_chunks
-    ]
-    META_PATH.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    if can_update:
+        if not rebuilt_files and not deleted_files:
+            if backfilled or not FACETS_PATH.exists():
+                update_chunk_store(CHUNKS_PATH, [], backfilled)
+                write_facets(cache)
+                bump_index_version()
+            log("Index is up to date")
+            return stats
+        log(f"Updating {engine} index in place")
+        index = faiss.read_index(str(INDEX_PATH))
+        remove_ids(index, removed_ids)
+        records = []
+        for rel_path, chunks in new_chunks.items():
+            ids = cache.files[rel_path]["ids"]
+            if not ids:
+                continue
+            index.add_with_ids(
+                new_embeddings[rel_path], np.asarray(ids, dtype="int64")
+            )
+            records.extend(zip(ids, map(chunk_metadata, chunks)))
+        update_chunk_store(CHUNKS_PATH, removed_ids, records + backfilled)
+        params = current["params"]
+        if index.ntotal != total:
+            # Stale vectors survived somewhere: start over rather than keep
+            # returning duplicates.
+            print(
+                f"Warning: updated index holds {index.ntotal} vectors for "
+                f"{total} chunks; rebuilding"
+            )
+            can_update = False
+    if not can_update:
+        entries = list(cache.files.values())
+        all_ids = [chunk_id for entry in entries for chunk_id in entry["ids"]]
+        embeddings = cache.embeddings(entries)
+        params = default_params(engine, len(embeddings), dim)
+        log(f"Index engine: {engine} ({storage}) {params}")
+        index = build_engine(
+            embeddings, engine, params, np.asarray(all_ids, dtype="int64"), storage
+        )
+        write_chunk_store(CHUNKS_PATH, zip(all_ids, cache.chunks(all_ids)))
 
+    tmp_index_path = INDEX_PATH.with_name(INDEX_PATH.name + ".tmp")
+    faiss.write_index(index, str(tmp_index_path))
+    os.replace(tmp_index_path, INDEX_PATH)
+    LEGACY_META_PATH.unlink(missing_ok=True)
+    write_facets(cache)
+    save_params(
+        INDEX_PARAMS_PATH,
+        engine,
+        params,
+        index.ntotal,
+        dim,
+        cache.next_id,
+        storage,
+        model_id,
+        index_type,
+    )
+    bump_index_version()
+    return stats
+
+
+def load_index() -> Tuple[faiss.Index, ChunkStore, dict]:
+    import faiss
 
-def load_index() -> Tuple[faiss.Index, List[dict]]:
-    if not INDEX_PATH.exists() or not META_PATH.exists():
+    from scripts.chunk_store import ChunkStore
+
+    if not INDEX_PATH.exists() or not CHUNKS_PATH.exists():
         raise FileNotFoundError("Index not found. Run with --rebuild to create it.")
     index = faiss.read_index(str(INDEX_PATH))
-    metadata = json.loads(META_PATH.read_text(encoding="utf-8"))
-    return index, metadata
+    return index, ChunkStore(CHUNKS_PATH), load_params(INDEX_PARAMS_PATH)
+
 
+def query_encoder(
+    model_name: str, backend: str, cache: Optional[QueryCache] = None
+) -> CachedQueryEncoder:
+    """Query encoder that only loads the model once a query misses ``cache``."""
+    return CachedQueryEncoder(
+        lambda: load_encoder(model_name, backend), model_key(model_name, backend), cache
+    )
 
-def search(query: str, k: int, min_score: float, model: SentenceTransformer) -> List[dict]:
-    index, metadata = load_index()
-    q = model.encode([query], normalize_embeddings=True)
-    q = np.asarray(q, dtype="float32")
-    scores, ids = index.search(q, k)
 
-    results = []
-    for score, idx in zip(scores[0], ids[0]):
-        if idx < 0:
-            continue
-        if float(score) < min_score:
-            continue
-        item = metadata[idx].copy()
-        item["score"] = float(score)
-        results.append(item)
+def result_cache_key(
+    model: CachedQueryEncoder,
+    query: str,
+    k: int,
+    min_score: float,
+    nprobe: Optional[int],
+    ef_search: Optional[int],
+    filter_by: str,
+) -> str:
+    return json.dumps(
+        [model.key, normalize_query(query), k, min_score, nprobe, ef_search, filter_by]
+    )
+
+
+def cached_search(
+    model: SentenceTransformer | CachedQueryEncoder,
+    version: Optional[str],
+    queries: List[str],
+    k: int,
+    min_score: float,
+    nprobe: Optional[int],
+    ef_search: Optional[int],
+    filter_by: str,
+    run: Callable[[List[str]], List[List[dict]]],
+) -> List[List[dict]]:
+    """Results per query from the result cache; ``run`` searches the misses in one batch."""
+    cache = model.cache if isinstance(model, CachedQueryEncoder) else None
+    if cache is None or version is None:
+        return run(queries)
+    keys = [
+        result_cache_key(model, q, k, min_score, nprobe, ef_search, filter_by)
+        for q in queries
+    ]
+    results = [cache.get_results(version, key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        for i, found in zip(missing, run([queries[i] for i in missing])):
+            results[i] = found
+            cache.put_results(version, keys[i], found)
     return results
 
 
+def search(
+    query: str,
+    k: int,
+    min_score: float,
+    model: SentenceTransformer | CachedQueryEncoder,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_by: str = "",
+) -> List[dict]:
+    return search_batch([query], k, min_score, model, nprobe, ef_search, filter_by)[0]
+
+
+def search_batch(
+    queries: List[str],
+    k: int,
+    min_score: float,
+    model: SentenceTransformer | CachedQueryEncoder,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_by: str = "",
+    loaded: Optional[Tuple[faiss.Index, ChunkStore, dict]] = None,
+) -> List[List[dict]]:
+    """Results for each query, loading the index at most once.
+
+    Pass ``loaded`` (from load_index()) to reuse one index across calls;
+    the caller then owns its chunk store.
+    """
+
+    def run(misses: List[str]) -> List[List[dict]]:
+        index, store, index_params = loaded or load_index()
+        try:
+            return search_index_batch(
+                index,
+                store,
+                index_params,
+                misses,
+                k,
+                min_score,
+                model,
+                nprobe,
+                ef_search,
+                filter_by,
+            )
+        finally:
+            if loaded is None:
+                store.close()
+
+    version = read_index_version()
+    return cached_search(
+        model, version, queries, k, min_score, nprobe, ef_search, filter_by, run
+    )
+
+
+def encode_queries(
+    model: SentenceTransformer | CachedQueryEncoder, queries: List[str]
+) -> np.ndarray:
+    import numpy as np
+
+    if isinstance(model, CachedQueryEncoder):
+        return model.encode_queries(queries, DEFAULT_BATCH_SIZE)
+    encoded = model.encode(
+        queries, batch_size=DEFAULT_BATCH_SIZE, normalize_embeddings=True
+    )
+    return np.asarray(encoded, dtype="float32")
+
+
+def search_index(
+    index: faiss.Index,
+    store: ChunkStore,
+    index_params: dict,
+    query: str,
+    k: int,
+    min_score: float,
+    model: SentenceTransformer | CachedQueryEncoder,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_by: str = "",
+    selectors: Optional[FilterSelectors] = None,
+) -> List[dict]:
+    return search_index_batch(
+        index,
+        store,
+        index_params,
+        [query],
+        k,
+        min_score,
+        model,
+        nprobe,
+        ef_search,
+        filter_by,
+        selectors,
+    )[0]
+
+
+def search_index_batch(
+    index: faiss.Index,
+    store: ChunkStore,
+    index_params: dict,
+    queries: List[str],
+    k: int,
+    min_score: float,
+    model: SentenceTransformer | CachedQueryEncoder,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_by: str = "",
+    selectors: Optional[FilterSelectors] = None,
+) -> List[List[dict]]:
+    """Encode all queries in one pass and search them with one index.search call."""
+    engine, engine_params = index_params["engine"], index_params["params"]
+    selector = None
+    if filter_by:
+        # Resolve the filter before encoding, so a filter matching nothing
+        # (or a malformed one) costs no model call.
+        if selectors is None:
+            selectors = FilterSelectors(load_facets())
+        selector = selectors.get(filter_by)
+        if selector is None:
+            return [[] for _ in queries]
+    if not queries:
+        return []
+    q = encode_queries(model, queries)
+    if selector is None:
+        params = search_parameters(engine, engine_params, nprobe, ef_search)
+        scores, ids = index.search(q, k, params=params)
+    else:
+        scores, ids = search_subset(
+            index, engine, engine_params, q, k, selector, nprobe, ef_search
+        )
+
+    batch = []
+    for row_scores, row_ids in zip(scores, ids):
+        results = []
+        for score, idx in zip(row_scores, row_ids):
+            if idx < 0:
+                continue
+            if float(score) < min_score:
+                continue
+            item = store.get(int(idx))
+            if item is None:
+                # Index replaced between our index and chunk store reads.
+                continue
+            item["score"] = float(score)
+            results.append(item)
+        batch.append(results)
+    return batch
+
+
 def print_results(results: List[dict]) -> None:
     for i, r in enumerate(results, start=1):
         print(f"{i}. {r['path']} -> {r['heading']} (score: {r['score']:.3f})")
@@ -227,7 +795,18 @@ def print_results(results: List[dict]) -> None:
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Search the KB offline.")
-    parser.add_argument("query", help="Search query string")
+    parser.add_argument("query", nargs="?", help="Search query string")
+    parser.add_argument(
+        "--queries",
+        metavar="FILE",
+        help="Search every line of FILE ('-' for stdin) and write JSONL results; "
+        'lines are plain queries or JSON objects with a "query" field',
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write --queries results to FILE instead of stdout",
+    )
     parser.add_argument("--k", type=int, default=5, help="Number of results")
     parser.add_argument(
         "--rebuild", action="store_true", help="Rebuild the index before search"
@@ -237,22 +816,248 @@ def parse_args() -> argparse.Namespace:
         default="sentence-transformers/all-MiniLM-L6-v2",
         help="Local model name or path",
     )
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=BACKENDS,
+        help="Encoder backend (default: torch or KB_ENCODER_BACKEND env var)",
+    )
     parser.add_argument(
         "--min-score",
         type=float,
         default=0.7,
         help="Minimum similarity score to include a result",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--index-type",
+        default=None,
+        choices=("auto",) + ENGINES,
+        help="Index engine used by --rebuild (default: the current index's; "
+        "auto picks by corpus size)",
+    )
+    parser.add_argument(
+        "--storage",
+        default=None,
+        choices=STORAGES,
+        help="Vector encoding used by --rebuild (default: the current index's, "
+        "else KB_VECTOR_STORAGE or float32)",
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=None,
+        help="IVF lists to scan per query (ivf-flat/ivf-pq indexes)",
+    )
+    parser.add_argument(
+        "--ef-search",
+        type=int,
+        default=None,
+        help="HNSW candidate list size per query (hnsw indexes)",
+    )
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="Only search chunks whose frontmatter matches, as for search_typesense.py "
+        "(e.g. 'domain:Search && type:howto')",
+    )
+    parser.add_argument(
+        "--no-server",
+        action="store_true",
+        help="Always search in-process, even if search_server.py is running",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the query embedding and result caches in .kb_index/",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print query cache hit rates after the results",
+    )
+    args = parser.parse_args()
+    if (args.query is None) == (args.queries is None):
+        parser.error("give either a query or --queries FILE")
+    if args.output and args.queries is None:
+        parser.error("--output needs --queries")
+    return args
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[dict]:
+    """One request per non-blank line: plain query text or a JSON object.
+
+    JSON objects need a "query" field; their other fields (e.g. an "id" or
+    expected answers) are copied to the output line untouched.
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith("{"):
+            yield {"query": line}
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            raise SystemExit(f"Line {number}: invalid JSON: {e}")
+        if not isinstance(request.get("query"), str):
+            raise SystemExit(f'Line {number}: missing string "query" field')
+        yield request
+
+
+def batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_queries(args: argparse.Namespace, model: Optional[CachedQueryEncoder]) -> int:
+    """Write one JSONL line per query in ``args.queries``; returns the query count.
+
+    Uses a running search_server.py unless ``model`` is given; otherwise the
+    index is loaded once and each batch is encoded and searched in one pass.
+    """
+    source = sys.stdin if args.queries == "-" else open(args.queries, encoding="utf-8")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    loaded = None
+    count = 0
+    try:
+        for batch in batches(read_queries(source), QUERY_BATCH_SIZE):
+            queries = [request["query"] for request in batch]
+            if model is None:
+                from scripts.search_server import query_server_batch
+
+                results = query_server_batch(
+                    queries,
+                    args.k,
+                    args.min_score,
+                    args.model,
+                    backend=args.backend,
+                    nprobe=args.nprobe,
+                    ef_search=args.ef_search,
+                    filter_by=args.filter,
+                )
+                if results is None:
+                    raise ConnectionError("search server stopped answering")
+            else:
+                if loaded is None:
+                    loaded = load_index()
+                results = search_batch(
+                    queries,
+                    args.k,
+                    args.min_score,
+                    model,
+                    args.nprobe,
+                    args.ef_search,
+                    args.filter,
+                    loaded,
+                )
+            for request, found in zip(batch, results):
+                out.write(json.dumps({**request, "results": found}) + "\n")
+            count += len(batch)
+    finally:
+        if loaded is not None:
+            loaded[1].close()
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        else:
+            out.flush()
+    return count
+
+
+def print_cache_stats(stats: dict, file=None) -> None:
+    for scope in ("session", "lifetime"):
+        parts = []
+        for kind in ("embedding", "result"):
+            s = stats[scope][kind]
+            total = s["hits"] + s["misses"]
+            parts.append(f"{kind} {s['hits']}/{total} hits ({s['hit_rate']:.0%})")
+        print(f"Query cache ({scope}): {', '.join(parts)}", file=file)
+    entries = stats["entries"]
+    print(
+        f"Query cache entries: {entries['embeddings']} embeddings, {entries['results']} results",
+        file=file,
+    )
 
 
 def main() -> None:
     args = parse_args()
-    model = SentenceTransformer(args.model)
+    try:
+        parse_filter(args.filter)
+    except FilterError as e:
+        raise SystemExit(f"Invalid --filter: {e}")
+    if args.queries is not None and not args.rebuild and not args.no_server:
+        from scripts.search_server import server_health
+
+        if server_health(args.model, args.backend):
+            count = run_queries(args, None)
+            print(f"Searched {count} queries via search_server.py", file=sys.stderr)
+            if args.stats:
+                from scripts.search_server import server_stats
+
+                stats = server_stats()
+                if stats:
+                    print_cache_stats(stats, sys.stderr)
+            return
+    elif not args.rebuild and not args.no_server:
+        from scripts.search_server import query_server
+
+        results = query_server(
+            args.query,
+            args.k,
+            args.min_score,
+            args.model,
+            backend=args.backend,
+            nprobe=args.nprobe,
+            ef_search=args.ef_search,
+            filter_by=args.filter,
+        )
+        if results is not None:
+            print_results(results)
+            if args.stats:
+                from scripts.search_server import server_stats
+
+                stats = server_stats()
+                if stats:
+                    print_cache_stats(stats)
+            return
+    cache = None if args.no_cache else QueryCache(QUERY_CACHE_PATH)
+    model = query_encoder(args.model, args.backend, cache)
     if args.rebuild or not INDEX_PATH.exists():
-        build_index(model)
-    results = search(args.query, args.k, args.min_score, model)
+        build_index(
+            model.model, args.index_type, model_id=model.key, storage=args.storage
+        )
+    if args.queries is not None:
+        start = time.perf_counter()
+        count = run_queries(args, model)
+        elapsed = time.perf_counter() - start
+        print(f"Searched {count} queries in {elapsed:.2f}s", file=sys.stderr)
+        if cache is not None:
+            if args.stats:
+                print_cache_stats(cache.stats(), sys.stderr)
+            cache.close()
+        return
+    results = search(
+        args.query,
+        args.k,
+        args.min_score,
+        model,
+        args.nprobe,
+        args.ef_search,
+        args.filter,
+    )
     print_results(results)
+    if cache is not None:
+        if args.stats:
+            print_cache_stats(cache.stats())
+        cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,278 @@
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+KB_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(KB_ROOT))
+
+from scripts.filters import FilterError, compile_filter  # noqa: E402
+from scripts.ingest import (  # noqa: E402
+    chunker_id,
+    iter_markdown_files,
+    iter_parsed_files,
+)
+from scripts.search import INDEX_DIR, KNOWLEDGE_DIR, file_hash, file_stat  # noqa: E402
+
+# SQLite FTS5 (stdlib, no server, no torch) holds one row per chunk,
+# exactly the chunks split_into_chunks() produces, with the frontmatter
+# fields used by --filter stored alongside but not tokenized.
+BM25_PATH = INDEX_DIR / "bm25.sqlite"
+# bm25() weights for the heading, text and path columns.
+FIELD_WEIGHTS = (2.0, 1.0, 1.0)
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    heading, text, path,
+    domain UNINDEXED, type UNINDEXED, status UNINDEXED, tags UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    stat TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_TERM = re.compile(r"\w+")
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def connect(path: Path = BM25_PATH) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    weights = ", ".join(str(w) for w in FIELD_WEIGHTS)
+    conn.execute(
+        "INSERT INTO chunks(chunks, rank) VALUES('rank', ?)", (f"bm25({weights})",)
+    )
+    return conn
+
+
+def build_bm25_index(
+    incremental: bool = True,
+    workers: Optional[int] = None,
+    changed: Optional[Iterable[Path]] = None,
+) -> dict:
+    """Re-index notes whose stat data and hash changed; drop deleted notes.
+
+    With ``changed``, notes outside it are assumed unchanged and not stat()ed.
+    """
+    candidates = set(changed) if changed is not None else None
+    if not incremental:
+        BM25_PATH.unlink(missing_ok=True)
+    conn = connect()
+    chunker = conn.execute("SELECT value FROM settings WHERE key = 'chunker'").fetchone()
+    if chunker is None or chunker[0] != chunker_id():
+        # Chunked with other settings: every note must be re-chunked.
+        with conn:
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM files")
+            conn.execute(
+                "INSERT OR REPLACE INTO settings(key, value) VALUES ('chunker', ?)",
+                (chunker_id(),),
+            )
+    known = {
+        path: (h, stat) for path, h, stat in conn.execute("SELECT path, hash, stat FROM files")
+    }
+
+    seen = set()
+    changed = []
+    touched = []
+    for path in iter_markdown_files(KNOWLEDGE_DIR):
+        rel_path = str(path.relative_to(KB_ROOT))
+        seen.add(rel_path)
+        entry = known.get(rel_path)
+        if entry and candidates is not None and path not in candidates:
+            continue
+        stat = json.dumps(file_stat(path))
+        if entry and entry[1] == stat:
+            continue
+        current_hash = file_hash(path)
+        if entry and entry[0] == current_hash:
+            touched.append((stat, rel_path))
+            continue
+        changed.append((path, current_hash, stat))
+    deleted = [p for p in known if p not in seen]
+
+    with conn:
+        conn.executemany("UPDATE files SET stat = ? WHERE path = ?", touched)
+        for rel_path in deleted + [str(p.relative_to(KB_ROOT)) for p, _, _ in changed]:
+            conn.execute("DELETE FROM chunks WHERE path = ?", (rel_path,))
+        conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in deleted])
+        hashes = {str(p.relative_to(KB_ROOT)): (h, stat) for p, h, stat in changed}
+        for parsed in iter_parsed_files([p for p, _, _ in changed], KB_ROOT, workers):
+            meta = parsed.metadata
+            conn.executemany(
+                "INSERT INTO chunks(heading, text, path, domain, type, status, tags) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        heading,
+                        text,
+                        parsed.path,
+                        meta.get("domain", ""),
+                        meta.get("type", ""),
+                        meta.get("status", ""),
+                        json.dumps(meta.get("tags", [])),
+                    )
+                    for heading, text in parsed.chunks
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO files(path, hash, stat) VALUES (?, ?, ?)",
+                (parsed.path, *hashes[parsed.path]),
+            )
+    if not known:
+        # Merge the FTS b-trees into one: smallest file, fastest queries.
+        conn.execute("INSERT INTO chunks(chunks) VALUES('optimize')")
+        conn.commit()
+    chunks = conn.execute("SELECT count(*) FROM chunks").fetchone()[0]
+    conn.close()
+    return {"rebuilt": len(changed), "deleted": len(deleted), "chunks": chunks}
+
+
+def match_expression(query: str) -> str:
+    """OR of the query terms, each a phrase of its tokens ("capture_note" -> "capture note")."""
+    phrases = []
+    for term in _TERM.findall(query):
+        tokens = _TOKEN.findall(term)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " OR ".join(phrases)
+
+
+def tokens_matched(query: str, document: dict) -> int:
+    """Query terms (counted as smart_search.py does) whose tokens all occur in the chunk."""
+    haystack = " ".join((document["heading"], document["text"], document["path"])).lower()
+    present = set(_TOKEN.findall(haystack))
+    return sum(
+        1
+        for term in _TERM.findall(query)
+        if set(_TOKEN.findall(term.lower())) <= present
+    )
+
+
+def search(query: str, k: int = 5, filter_by: str = "") -> List[dict]:
+    """BM25 search, returning hits shaped like Typesense's (document, text_match)."""
+    if not BM25_PATH.exists():
+        raise FileNotFoundError("BM25 index not found. Run with --rebuild to create it.")
+    conn = sqlite3.connect(f"file:{BM25_PATH}?mode=ro", uri=True)
+    try:
+        where = []
+        params: list = []
+        if filter_by:
+            predicate = compile_filter(filter_by)
+            conn.create_function(
+                "kb_filter",
+                4,
+                lambda domain, type_, status, tags: predicate(
+                    {
+                        "domain": domain,
+                        "type": type_,
+                        "status": status,
+                        "tags": json.loads(tags),
+                    }
+                ),
+                deterministic=True,
+            )
+            where.append("kb_filter(domain, type, status, tags)")
+        match = match_expression(query)
+        columns = "heading, text, path, domain, type, status, tags"
+        if match:
+            where.insert(0, "chunks MATCH ?")
+            params.append(match)
+            sql = (
+                f"SELECT {columns}, -rank FROM chunks"
+                f" WHERE {' AND '.join(where)} ORDER BY rank"
+            )
+        else:
+            # Wildcard ("*") queries: every chunk passing the filter.
+            sql = f"SELECT {columns}, 0.0 FROM chunks"
+            if where:
+                sql += f" WHERE {' AND '.join(where)}"
+            sql += " ORDER BY path"
+        rows = conn.execute(sql + " LIMIT ?", (*params, k)).fetchall()
+    finally:
+        conn.close()
+
+    hits = []
+    for heading, text, path, domain, type_, status, tags, score in rows:
+        document = {
+            "heading": heading,
+            "text": text,
+            "path": path,
+            "domain": domain,
+            "type": type_,
+            "status": status,
+            "tags": json.loads(tags),
+        }
+        hits.append(
+            {
+                "document": document,
+                "text_match": round(score, 4),
+                "text_match_info": {"tokens_matched": tokens_matched(query, document)},
+            }
+        )
+    return hits
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Search the KB with a local BM25 index (no server, no model)."
+    )
+    parser.add_argument("query", help="Search query string ('*' lists filtered chunks)")
+    parser.add_argument("--k", type=int, default=5, help="Number of results")
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="Filter expression as for search_typesense.py, e.g. 'domain:Search && type:howto'",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild the whole BM25 index (changed notes are always re-indexed)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for reading and chunking notes (0 = in-process)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    from scripts.search_typesense import configure_console_encoding, print_results
+
+    configure_console_encoding()
+    args = parse_args()
+    try:
+        compile_filter(args.filter)
+    except FilterError as e:
+        raise SystemExit(f"Invalid --filter: {e}")
+    # Checking stat data of every note takes a few milliseconds, so the index
+    # is refreshed on every search rather than going stale.
+    stats = build_bm25_index(incremental=not args.rebuild, workers=args.workers)
+    if stats["rebuilt"] or stats["deleted"]:
+        print(
+            f"BM25 index: {stats['chunks']} chunks "
+            f"({stats['rebuilt']} files indexed, {stats['deleted']} removed)\n"
+        )
+    start = time.perf_counter()
+    results = search(args.query, args.k, args.filter)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print_results(results)
+    print(f"({len(results)} results in {elapsed_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL  # noqa: E402
+
+DEFAULT_HOST = os.getenv("KB_SEARCH_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("KB_SEARCH_PORT", "8765"))
+CLIENT_TIMEOUT_SECONDS = float(os.getenv("KB_SEARCH_TIMEOUT", "10"))
+
+
+class SearchState:
+    """Warm model, FAISS index and chunk store, reloaded when the index version changes."""
+
+    def __init__(self, model_name: str, backend: str, use_cache: bool = True) -> None:
+        from scripts.query_cache import QueryCache
+        from scripts.search import QUERY_CACHE_PATH, query_encoder
+
+        self.model_name = model_name
+        self.backend = backend
+        self.cache = QueryCache(QUERY_CACHE_PATH) if use_cache else None
+        self.model = query_encoder(model_name, backend, self.cache)
+        self.model.model  # load now, not on the first uncached query
+        self._reload_lock = threading.Lock()
+        # (version, index, store, params, selectors) is swapped as a single tuple
+        # so a request never sees an index paired with another build's chunks.
+        self._loaded = (None, None, None, None, None)
+        # Requests using each loaded tuple (by id), and replaced tuples whose
+        # chunk store is closed once their last request finishes.
+        self._users_lock = threading.Lock()
+        self._users: Dict[int, int] = {}
+        self._retired: Dict[int, tuple] = {}
+
+    def current(self):
+        from scripts.search import (
+            FACETS_PATH,
+            FilterSelectors,
+            load_facets,
+            load_index,
+            read_index_version,
+        )
+
+        version = read_index_version()
+        if self._loaded[1] is not None and version == self._loaded[0]:
+            return self._loaded
+        with self._reload_lock:
+            if self._loaded[1] is not None and version == self._loaded[0]:
+                return self._loaded
+            index, store, index_params = load_index()
+            selectors = (
+                FilterSelectors(load_facets()) if FACETS_PATH.exists() else None
+            )
+            loaded = (version, index, store, index_params, selectors)
+            with self._users_lock:
+                old, self._loaded = self._loaded, loaded
+                if old[2] is not None:
+                    if self._users.get(id(old)):
+                        self._retired[id(old)] = old
+                    else:
+                        old[2].close()
+            print(f"Loaded index version {version} ({len(store)} chunks)")
+        return self._loaded
+
+    @contextmanager
+    def acquire(self) -> Iterator[tuple]:
+        """The current load; a reload meanwhile closes its store only after use."""
+        self.current()
+        with self._users_lock:
+            loaded = self._loaded
+            self._users[id(loaded)] = self._users.get(id(loaded), 0) + 1
+        try:
+            yield loaded
+        finally:
+            with self._users_lock:
+                key = id(loaded)
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    retired = self._retired.pop(key, None)
+                    if retired is not None:
+                        retired[2].close()
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        min_score: float,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filter_by: str = "",
+    ) -> List[dict]:
+        return self.search_batch([query], k, min_score, nprobe, ef_search, filter_by)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int,
+        min_score: float,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filter_by: str = "",
+    ) -> List[List[dict]]:
+        from scripts.search import cached_search, search_index_batch
+
+        with self.acquire() as loaded:
+            version, index, store, index_params, selectors = loaded
+
+            def run(misses: List[str]) -> List[List[dict]]:
+                return search_index_batch(
+                    index,
+                    store,
+                    index_params,
+                    misses,
+                    k,
+                    min_score,
+                    self.model,
+                    nprobe,
+                    ef_search,
+                    filter_by,
+                    selectors,
+                )
+
+            return cached_search(
+                self.model,
+                version,
+                queries,
+                k,
+                min_score,
+                nprobe,
+                ef_search,
+                filter_by,
+                run,
+            )
+
+    def stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {}
+
+
+def make_handler(state: SearchState):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                self._send_json(200, {"query_cache": state.stats()})
+                return
+            if self.path != "/health":
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(
+                200,
+                {"status": "ok", "model": state.model_name, "backend": state.backend},
+            )
+
+        def do_POST(self) -> None:
+            if self.path != "/search":
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            model = request.get("model", state.model_name)
+            backend = request.get("backend", state.backend)
+            if (model, backend) != (state.model_name, state.backend):
+                self._send_json(
+                    409,
+                    {
+                        "error": f"server runs {state.model_name} ({state.backend}), "
+                        f"not {model} ({backend})"
+                    },
+                )
+                return
+            # {"queries": [...]} searches a batch and returns one result
+            # list per query, in order.
+            batch = "queries" in request
+            try:
+                results = state.search_batch(
+                    request["queries"] if batch else [request["query"]],
+                    int(request.get("k", 5)),
+                    float(request.get("min_score", 0.0)),
+                    request.get("nprobe"),
+                    request.get("ef_search"),
+                    request.get("filter", ""),
+                )
+            except FileNotFoundError as e:
+                self._send_json(503, {"error": str(e)})
+                return
+            except ValueError as e:
+                # Malformed filter expression (filters.FilterError).
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, {"results": results if batch else results[0]})
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+def query_server(
+    query: str,
+    k: int,
+    min_score: float,
+    model: str,
+    backend: str = DEFAULT_BACKEND,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    timeout: float = CLIENT_TIMEOUT_SECONDS,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_by: str = "",
+) -> Optional[List[dict]]:
+    """Search via a running server; return None so callers fall back in-process."""
+    return _post_search(
+        {
+            "query": query,
+            "k": k,
+            "min_score": min_score,
+            "model": model,
+            "backend": backend,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "filter": filter_by,
+        },
+        host,
+        port,
+        timeout,
+    )
+
+
+def query_server_batch(
+    queries: List[str],
+    k: int,
+    min_score: float,
+    model: str,
+    backend: str = DEFAULT_BACKEND,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    timeout: float = CLIENT_TIMEOUT_SECONDS,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_by: str = "",
+) -> Optional[List[List[dict]]]:
+    """Like query_server, with one request and one result list per query."""
+    return _post_search(
+        {
+            "queries": queries,
+            "k": k,
+            "min_score": min_score,
+            "model": model,
+            "backend": backend,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "filter": filter_by,
+        },
+        host,
+        port,
+        timeout,
+    )
+
+
+def _post_search(payload: dict, host: str, port: int, timeout: float):
+    request = urllib.request.Request(
+        f"http://{host}:{port}/search",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["results"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+
+
+def server_health(
+    model: str,
+    backend: str = DEFAULT_BACKEND,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    timeout: float = CLIENT_TIMEOUT_SECONDS,
+) -> bool:
+    """True if a server is running with ``model`` on ``backend``."""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=timeout) as response:
+            health = json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+    return health.get("model") == model and health.get("backend") == backend
+
+
+def server_stats(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    timeout: float = CLIENT_TIMEOUT_SECONDS,
+) -> Optional[dict]:
+    """Query cache stats of a running server, or None if it cannot be reached."""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/stats", timeout=timeout) as response:
+            return json.loads(response.read())["query_cache"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Keep the KB model and FAISS index warm for fast searches."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Bind address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Bind port")
+    parser.add_argument(
+        "--model", default=DEFAULT_MODEL, help="Local model name or path"
+    )
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=BACKENDS,
+        help="Encoder backend (default: torch or KB_ENCODER_BACKEND env var)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not cache query embeddings and results in .kb_index/",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    state = SearchState(args.model, args.backend, use_cache=not args.no_cache)
+    try:
+        state.current()
+    except FileNotFoundError as e:
+        print(f"{e} The server will load it once it exists.")
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Serving KB search on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
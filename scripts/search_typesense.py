@@ -1,11 +1,28 @@
+from __future__ import annotations
+
 import argparse
-import os
 import sys
 from contextlib import contextmanager
 from io import StringIO
-from typing import List
+from pathlib import Path
+from typing import TYPE_CHECKING, List
+
+KB_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(KB_ROOT))
+
+from scripts.typesense_client import (  # noqa: E402
+    add_connection_arguments,
+    client_from_args,
+    node_healthy,
+    parse_nodes,
+)
+
+if TYPE_CHECKING:
+    import typesense
 
-import typesense
+# typesense is only imported when typesense_client.py builds a client, so
+# print_results() also serves the local BM25 backend (search_bm25.py) when
+# the client is not installed.
 
 
 def configure_console_encoding() -> None:
@@ -27,20 +44,7 @@ def suppress_typesense_warnings():
         sys.stderr = old_stderr
 
 
-def create_client(host: str, port: int, api_key: str) -> typesense.Client:
-    """Create Typesense client."""
-    return typesense.Client({
-        'nodes': [{
-            'host': host,
-            'port': port,
-            'protocol': 'http'
-        }],
-        'api_key': api_key,
-        'connection_timeout_seconds': 2
-    })
-
-
-def search(
+def search_hits(
     client: typesense.Client,
     collection_name: str,
     query: str,
@@ -48,7 +52,7 @@ def search(
     filter_by: str = "",
     query_by: str = "text,heading,path",
 ) -> List[dict]:
-    """Search the KB using Typesense."""
+    """Search the KB using Typesense, raising on client or server errors."""
     search_params = {
         'q': query,
         'query_by': query_by,
@@ -59,9 +63,21 @@ def search(
     if filter_by:
         search_params['filter_by'] = filter_by
 
+    results = client.collections[collection_name].documents.search(search_params)
+    return results.get('hits', [])
+
+
+def search(
+    client: typesense.Client,
+    collection_name: str,
+    query: str,
+    k: int = 5,
+    filter_by: str = "",
+    query_by: str = "text,heading,path",
+) -> List[dict]:
+    """Search the KB using Typesense."""
     try:
-        results = client.collections[collection_name].documents.search(search_params)
-        return results.get('hits', [])
+        return search_hits(client, collection_name, query, k, filter_by, query_by)
     except Exception as e:
         print(f"Search error: {e}")
         return []
@@ -105,27 +121,12 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Search the KB using Typesense full-text search."
     )
-    parser.add_argument("query", help="Search query string")
-    parser.add_argument(
-        "--host",
-        default=os.getenv("TYPESENSE_HOST", "localhost"),
-        help="Typesense host (default: localhost or TYPESENSE_HOST env var)"
-    )
-    parser.add_argument(
-        "--port",
-        type=int,
-        default=int(os.getenv("TYPESENSE_PORT", "8108")),
-        help="Typesense port (default: 8108 or TYPESENSE_PORT env var)"
-    )
-    parser.add_argument(
-        "--api-key",
-        default=os.getenv("TYPESENSE_API_KEY", "xyz"),
-        help="Typesense API key (default: xyz or TYPESENSE_API_KEY env var)"
-    )
+    parser.add_argument("query", nargs="?", help="Search query string")
+    add_connection_arguments(parser)
     parser.add_argument(
         "--collection",
         default="kb_chunks",
-        help="Collection name (default: kb_chunks)"
+        help="Collection or alias name (default: kb_chunks, the alias index_typesense.py maintains)"
     )
     parser.add_argument(
         "--k",
@@ -143,16 +144,36 @@ def parse_args() -> argparse.Namespace:
         default="text,heading,path",
         help="Fields to search (default: text,heading,path)"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--healthcheck",
+        action="store_true",
+        help="Only check that Typesense is up (exit code 1 if no node answers)"
+    )
+    args = parser.parse_args()
+    if args.query is None and not args.healthcheck:
+        parser.error("the following arguments are required: query")
+    return args
+
+
+def run_healthcheck(args: argparse.Namespace) -> int:
+    healthy = 0
+    for node in parse_nodes(args.host, args.port):
+        ok = node_healthy(node)
+        healthy += ok
+        protocol, host, port = node
+        print(f"{protocol}://{host}:{port} {'ok' if ok else 'unreachable'}")
+    return 0 if healthy else 1
 
 
 def main() -> None:
     """Main entry point."""
     configure_console_encoding()
     args = parse_args()
+    if args.healthcheck:
+        sys.exit(run_healthcheck(args))
 
     with suppress_typesense_warnings():
-        client = create_client(args.host, args.port, args.api_key)
+        client = client_from_args(args)
         results = search(
             client,
             args.collection,
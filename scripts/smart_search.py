@@ -0,0 +1,282 @@
+import argparse
+import re
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL  # noqa: E402
+from scripts.filters import FilterError, parse_filter  # noqa: E402
+from scripts.fusion import FUSION_METHODS, SOURCES, fuse, lexical_items  # noqa: E402
+from scripts.typesense_client import (  # noqa: E402
+    add_connection_arguments,
+    client_from_args,
+    healthcheck,
+)
+
+# Typesense drops query tokens it cannot find, so a hit only counts as good
+# when it matched every token of the query (wildcard queries always do).
+DEFAULT_MIN_HITS = 1
+# Hybrid mode fuses this many results from each backend.
+DEFAULT_CANDIDATES = 20
+# Vector-side failures that fall back to the lexical results: missing
+# packages, missing or outdated index files (e.g. no facets.json for
+# --filter), and search server errors (urllib's URLError and HTTPError are
+# OSErrors).
+VECTOR_ERRORS = (ImportError, OSError)
+
+
+def run_in_background(fn: Callable, *args) -> Future:
+    """Run ``fn`` in a daemon thread, so a finished search never waits on the other."""
+    future: Future = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def typesense_search(args: argparse.Namespace) -> List[dict]:
+    from scripts.search_typesense import search_hits, suppress_typesense_warnings
+
+    with suppress_typesense_warnings():
+        client = client_from_args(args)
+    return search_hits(client, args.collection, args.query, args.k, args.filter)
+
+
+def lexical_search(args: argparse.Namespace) -> Tuple[str, List[dict]]:
+    """Typesense hits, or hits from the local BM25 index when Typesense is down."""
+    try:
+        # A stopped server refuses /health at once; without this check the
+        # client would spend its whole retry budget finding that out.
+        if not healthcheck(args.host, args.port):
+            raise ConnectionError(f"no Typesense node answers at {args.host}")
+        return "Typesense", typesense_search(args)
+    except Exception as e:
+        from scripts.search_bm25 import build_bm25_index, search
+
+        print(f"Typesense unavailable ({e}); using the local BM25 index")
+        build_bm25_index()
+        return "BM25", search(args.query, args.k, args.filter)
+
+
+def full_match(hit: dict, query: str) -> bool:
+    tokens = re.findall(r"\w+", query)
+    if not tokens:
+        return True  # wildcard ("*") queries
+    info = hit.get("text_match_info")
+    if info is None:
+        return hit.get("text_match", 0) > 0
+    return info.get("tokens_matched", 0) >= len(tokens)
+
+
+def good_typesense_hits(hits: List[dict], query: str, min_hits: int) -> bool:
+    return sum(full_match(hit, query) for hit in hits) >= min_hits
+
+
+class VectorSearch:
+    """FAISS side: a running search_server.py, else an in-process model and index."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.model = None
+
+    def prepare(self) -> Optional[List[dict]]:
+        """Search if an index exists; None means the index must be built first."""
+        from scripts.query_cache import QueryCache
+        from scripts.search import INDEX_PATH, QUERY_CACHE_PATH, query_encoder, search
+        from scripts.search_server import query_server
+
+        args = self.args
+        results = query_server(
+            args.query,
+            args.k,
+            args.min_score,
+            args.model,
+            backend=args.backend,
+            filter_by=args.filter,
+        )
+        if results is not None:
+            return results
+        self.model = query_encoder(args.model, args.backend, QueryCache(QUERY_CACHE_PATH))
+        if not INDEX_PATH.exists():
+            # Load the model now, while the lexical search is still running.
+            self.model.model
+            return None
+        return search(
+            args.query, args.k, args.min_score, self.model, filter_by=args.filter
+        )
+
+    def build_and_search(self) -> List[dict]:
+        from scripts.search import build_index, search
+
+        args = self.args
+        build_index(self.model.model, model_id=self.model.key)
+        return search(
+            args.query, args.k, args.min_score, self.model, filter_by=args.filter
+        )
+
+
+def hybrid_search(args: argparse.Namespace) -> List[dict]:
+    """Top ``--candidates`` from both backends, fetched concurrently and fused."""
+    candidates = argparse.Namespace(
+        **{**vars(args), "k": args.candidates, "min_score": -1.0}
+    )
+    vector = VectorSearch(candidates)
+    lexical_future = run_in_background(lexical_search, candidates)
+    vector_future = run_in_background(vector.prepare)
+
+    hits: List[dict] = []
+    try:
+        _, hits = lexical_future.result()
+    except Exception as e:
+        print(f"Lexical search failed, using vector results only: {e}")
+    try:
+        results = vector_future.result()
+        if results is None:
+            results = vector.build_and_search()
+    except VECTOR_ERRORS as e:
+        print(f"FAISS search unavailable, using lexical results only: {e}")
+        results = []
+    fused = fuse(lexical_items(hits), results, args.fusion, args.lexical_weight)
+    return fused[: args.k]
+
+
+def print_fused(results: List[dict]) -> None:
+    if not results:
+        print("No results found.")
+        return
+    for i, r in enumerate(results, start=1):
+        ranks = ", ".join(f"{s} #{r['ranks'][s]}" for s in SOURCES if s in r["ranks"])
+        print(f"{i}. {r['path']} -> {r['heading']} (score: {r['score']:.4f}; {ranks})")
+        snippet = r["text"].strip().splitlines()
+        print("\n".join(snippet[:8]))
+        print("---")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Search the KB with Typesense and FAISS concurrently, "
+        "keeping Typesense hits when they match the query well."
+    )
+    parser.add_argument("query", help="Search query string")
+    parser.add_argument("--k", type=int, default=5, help="Number of results")
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="Typesense filter expression, also applied to BM25 and FAISS results",
+    )
+    parser.add_argument(
+        "--min-score",
+        type=float,
+        default=0.7,
+        help="Minimum similarity score for FAISS results",
+    )
+    parser.add_argument(
+        "--min-hits",
+        type=int,
+        default=DEFAULT_MIN_HITS,
+        help="Typesense hits matching every query token needed to skip FAISS",
+    )
+    parser.add_argument(
+        "--hybrid",
+        action="store_true",
+        help="Fuse Typesense and FAISS results instead of falling back",
+    )
+    parser.add_argument(
+        "--fusion",
+        default="rrf",
+        choices=FUSION_METHODS,
+        help="Hybrid fusion: reciprocal rank fusion or weighted normalised scores",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=DEFAULT_CANDIDATES,
+        help=f"Results fetched from each backend in hybrid mode (default: {DEFAULT_CANDIDATES})",
+    )
+    parser.add_argument(
+        "--lexical-weight",
+        type=float,
+        default=0.5,
+        help="Weight of Typesense vs FAISS in hybrid mode, 0..1 (default: 0.5)",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Local model name or path")
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=BACKENDS,
+        help="Encoder backend (default: torch or KB_ENCODER_BACKEND env var)",
+    )
+    add_connection_arguments(parser)
+    parser.add_argument(
+        "--collection", default="kb_chunks", help="Collection name (default: kb_chunks)"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    args = parse_args()
+    try:
+        parse_filter(args.filter)
+    except FilterError as e:
+        raise SystemExit(f"Invalid --filter: {e}")
+    print(f"Searching KB for: {args.query}\n")
+    if args.hybrid:
+        print_fused(hybrid_search(args))
+        return
+
+    vector = VectorSearch(args)
+    lexical_future = run_in_background(lexical_search, args)
+    vector_future = run_in_background(vector.prepare)
+
+    hits: List[dict] = []
+    try:
+        source, hits = lexical_future.result()
+    except Exception as e:
+        print(f"Lexical search failed: {e}")
+    else:
+        if good_typesense_hits(hits, args.query, args.min_hits):
+            from scripts.search_typesense import print_results
+
+            print(f"Found results in {source}:\n")
+            print_results(hits)
+            return
+        if hits:
+            print(f"{source} hits only partially match the query")
+        else:
+            print(f"{source} returned no results")
+
+    print("\nFalling back to FAISS (semantic vector search)...\n")
+    try:
+        results = vector_future.result()
+        if results is None:
+            results = vector.build_and_search()
+    except VECTOR_ERRORS as e:
+        print(f"FAISS search unavailable: {e}")
+        results = []
+    from scripts.search import print_results
+
+    if results:
+        print_results(results)
+    elif hits:
+        from scripts.search_typesense import print_results as print_hits
+
+        print("No FAISS results above --min-score; partial lexical matches:\n")
+        print_hits(hits)
+    else:
+        print("No results found.")
+
+
+if __name__ == "__main__":
+    main()
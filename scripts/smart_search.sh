@@ -1,5 +1,5 @@
 #!/bin/bash
-# Smart KB search: Try Typesense first, fallback to FAISS if no good results
+# Smart KB search: Typesense and FAISS in parallel, FAISS when Typesense hits are weak
 # Usage: ./smart_search.sh "query" [--filter "filter_expr"] [--min-score 0.8] [--kb-path PATH]
 #
 # Arguments:
@@ -94,9 +94,6 @@ if [ -z "$KB_PATH" ]; then
     fi
 fi
 
-echo "🔍 Searching KB for: $QUERY"
-echo ""
-
 # Keep uv generated state in predictable KB-local paths.
 if [ "$KB_PATH" = "." ]; then
     KB_ABS_PATH="$(pwd)"
@@ -114,46 +111,17 @@ mkdir -p "$UV_CACHE_DIR" "$UV_PROJECT_ENVIRONMENT" || {
 }
 KB_PYTHON="$UV_PROJECT_ENVIRONMENT/bin/python"
 
-# Try Typesense first
-echo "📊 Trying Typesense (fast full-text search)..."
-if [ -x "$KB_PYTHON" ]; then
-    TYPESENSE_CMD="\"$KB_PYTHON\" \"$KB_ABS_PATH/scripts/search_typesense.py\" \"$QUERY\""
-else
-    TYPESENSE_CMD="uv run --no-project --with typesense python \"$KB_ABS_PATH/scripts/search_typesense.py\" \"$QUERY\""
-fi
+# Typesense and FAISS run concurrently in one Python process; Typesense hits
+# win when they match every query token, otherwise FAISS results are shown
+# (via a running search_server.py when available).
+SMART_ARGS=("$QUERY" --min-score "$MIN_SCORE")
 if [ -n "$FILTER" ]; then
-    TYPESENSE_CMD="$TYPESENSE_CMD --filter \"$FILTER\""
+    SMART_ARGS+=(--filter "$FILTER")
 fi
 
-TMP_RESULTS="$(mktemp -t typesense_results.XXXXXX)"
-trap 'rm -f "$TMP_RESULTS"' EXIT
-
-if eval "$TYPESENSE_CMD" > "$TMP_RESULTS" 2>&1; then
-    # Check if we got good results (more than just header lines)
-    RESULT_COUNT=$(cat "$TMP_RESULTS" | wc -l)
-
-    if [ "$RESULT_COUNT" -gt 5 ]; then
-        echo "✅ Found results in Typesense:"
-        echo ""
-        cat "$TMP_RESULTS"
-        exit 0
-    else
-        echo "⚠️  Typesense returned few/no results"
-    fi
+if [ -x "$KB_PYTHON" ]; then
+    "$KB_PYTHON" "$KB_ABS_PATH/scripts/smart_search.py" "${SMART_ARGS[@]}"
 else
-    echo "⚠️  Typesense search failed (server might not be running)"
+    uv run --no-project --with typesense --with faiss-cpu --with numpy --with sentence-transformers \
+        python "$KB_ABS_PATH/scripts/smart_search.py" "${SMART_ARGS[@]}"
 fi
-
-# Fallback to FAISS
-echo ""
-echo "🧠 Falling back to FAISS (semantic vector search)..."
-echo ""
-
-(
-    cd "$KB_ABS_PATH"
-    if [ -x "$KB_PYTHON" ]; then
-        "$KB_PYTHON" scripts/search.py "$QUERY" --min-score "$MIN_SCORE"
-    else
-        uv run --no-project --with faiss-cpu --with numpy --with sentence-transformers python scripts/search.py "$QUERY" --min-score "$MIN_SCORE"
-    fi
-)
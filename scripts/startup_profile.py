@@ -0,0 +1,115 @@
+import argparse
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# CLI modules whose cold start we keep small, and the imports they must defer.
+DEFAULT_TARGETS = (
+    "scripts.search",
+    "scripts.index_kb",
+    "scripts.search_server",
+    "scripts.search_bm25",
+    "scripts.smart_search",
+    "scripts.watch_kb",
+)
+HEAVY_MODULES = ("faiss", "numpy", "sentence_transformers", "tqdm", "torch", "typesense")
+DEFAULT_BUDGET_MS = 150.0
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int]]:
+    """(module, depth, cumulative us) for every import ``module`` triggers."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            rows.append((name, len(indent) // 2, int(cumulative)))
+    return rows
+
+
+def help_wall_ms(module: str, runs: int) -> float:
+    """Best-of-``runs`` wall time of ``<script> --help`` in a fresh interpreter."""
+    script = ROOT / (module.replace(".", "/") + ".py")
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(script), "--help"],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def subtree(rows: List[Tuple[str, int, int]], module: str) -> List[Tuple[str, int, int]]:
+    """Rows imported on behalf of ``module`` (importtime lists children first)."""
+    end = max(i for i, (name, depth, _) in enumerate(rows) if name == module and depth == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    return rows[start:end + 1]
+
+
+def report(module: str, top: int, runs: int, budget_ms: float) -> bool:
+    rows = subtree(import_profile(module), module)
+    total_ms = rows[-1][2] / 1000
+    heavy = sorted({name for name, _, _ in rows if name in HEAVY_MODULES})
+    print(f"{module}: import {total_ms:.1f} ms, --help {help_wall_ms(module, runs):.1f} ms")
+    direct = sorted((r for r in rows if r[1] == 1), key=lambda r: r[2], reverse=True)
+    for name, _, us in direct[:top]:
+        print(f"  {us / 1000:>8.1f} ms  {name}")
+
+    ok = True
+    if heavy:
+        print(f"  FAILED: imports {', '.join(heavy)} at module load")
+        ok = False
+    if total_ms > budget_ms:
+        print(f"  FAILED: import time over the {budget_ms:.0f} ms budget")
+        ok = False
+    return ok
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Profile CLI cold start (python -X importtime) and check the budget."
+    )
+    parser.add_argument(
+        "modules", nargs="*", default=list(DEFAULT_TARGETS), help="Modules to profile"
+    )
+    parser.add_argument("--top", type=int, default=8, help="Slowest direct imports to list")
+    parser.add_argument("--runs", type=int, default=3, help="--help runs (best is kept)")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Maximum import time per module (default: {DEFAULT_BUDGET_MS:.0f} ms)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = [report(m, args.top, args.runs, args.budget_ms) for m in args.modules]
+    raise SystemExit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    import typesense
+
+# Shared by every Typesense entry point. Stdlib only at import time:
+# healthcheck() must answer before the client library would even load.
+
+DEFAULT_HOST = os.getenv("TYPESENSE_HOST", "localhost")
+DEFAULT_PORT = int(os.getenv("TYPESENSE_PORT", "8108"))
+DEFAULT_API_KEY = os.getenv("TYPESENSE_API_KEY", "xyz")
+# Per-request timeout and retry budget. The client library's own defaults
+# (3 retries, 1 s apart) stall a search for seconds when a node is down.
+DEFAULT_TIMEOUT = float(os.getenv("TYPESENSE_TIMEOUT", "2"))
+DEFAULT_NUM_RETRIES = int(os.getenv("TYPESENSE_NUM_RETRIES", "2"))
+RETRY_INTERVAL_SECONDS = 0.1
+# How long a node that failed stays out of rotation before being retried.
+HEALTHCHECK_INTERVAL_SECONDS = 15
+HEALTHCHECK_TIMEOUT = float(os.getenv("TYPESENSE_HEALTHCHECK_TIMEOUT", "0.3"))
+
+Node = Tuple[str, str, int]
+
+
+def parse_nodes(hosts: str, port: int = DEFAULT_PORT) -> List[Node]:
+    """(protocol, host, port) per entry of "host", "host:port" or "https://host:port".
+
+    ``hosts`` is comma-separated for a multi-node cluster; ``port`` is the
+    default for entries without one.
+    """
+    nodes = []
+    for entry in hosts.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        protocol, _, address = entry.rpartition("://")
+        host, sep, node_port = address.partition(":")
+        nodes.append((protocol or "http", host, int(node_port) if sep else port))
+    if not nodes:
+        raise ValueError(f"No Typesense nodes in {hosts!r}")
+    return nodes
+
+
+@lru_cache(maxsize=None)
+def _cached_client(
+    nodes: Tuple[Node, ...], api_key: str, timeout: float, num_retries: int
+) -> typesense.Client:
+    import typesense
+
+    return typesense.Client({
+        'nodes': [
+            {'host': host, 'port': port, 'protocol': protocol}
+            for protocol, host, port in nodes
+        ],
+        'api_key': api_key,
+        'connection_timeout_seconds': timeout,
+        'num_retries': num_retries,
+        'retry_interval_seconds': RETRY_INTERVAL_SECONDS,
+        'healthcheck_interval_seconds': HEALTHCHECK_INTERVAL_SECONDS,
+    })
+
+
+def create_client(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    api_key: str = DEFAULT_API_KEY,
+    timeout: float = DEFAULT_TIMEOUT,
+    num_retries: int = DEFAULT_NUM_RETRIES,
+) -> typesense.Client:
+    """Typesense client for one node or a comma-separated list of them.
+
+    Clients are shared per configuration within a process, so repeated
+    searches and concurrent import batches reuse pooled keep-alive
+    connections. Requests that fail move on to the next node (a failed node
+    is skipped for HEALTHCHECK_INTERVAL_SECONDS), up to ``num_retries``
+    retries in total.
+    """
+    return _cached_client(tuple(parse_nodes(host, port)), api_key, timeout, num_retries)
+
+
+def client_from_args(args: argparse.Namespace) -> typesense.Client:
+    return create_client(args.host, args.port, args.api_key, args.timeout, args.num_retries)
+
+
+def node_healthy(node: Node, timeout: float = HEALTHCHECK_TIMEOUT) -> bool:
+    protocol, host, port = node
+    connection_class = (
+        http.client.HTTPSConnection if protocol == "https" else http.client.HTTPConnection
+    )
+    connection = connection_class(host, port, timeout=timeout)
+    try:
+        connection.request("GET", "/health")
+        response = connection.getresponse()
+        return response.status == 200 and json.loads(response.read()).get("ok") is True
+    except (OSError, ValueError, http.client.HTTPException):
+        return False
+    finally:
+        connection.close()
+
+
+def healthcheck(
+    host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = HEALTHCHECK_TIMEOUT
+) -> bool:
+    """True if any node answers /health within ``timeout`` seconds.
+
+    A stopped server refuses the connection at once, so callers can skip
+    Typesense in milliseconds instead of waiting out the client's retries.
+    """
+    return any(node_healthy(node, timeout) for node in parse_nodes(host, port))
+
+
+def add_connection_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help="Typesense host, or comma-separated nodes such as 'ts1:8108,ts2:8108' "
+        "(default: localhost or TYPESENSE_HOST env var)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="Typesense port for hosts without one (default: 8108 or TYPESENSE_PORT env var)",
+    )
+    parser.add_argument(
+        "--api-key",
+        default=DEFAULT_API_KEY,
+        help="Typesense API key (default: xyz or TYPESENSE_API_KEY env var)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"Seconds per Typesense request (default: {DEFAULT_TIMEOUT:g} "
+        "or TYPESENSE_TIMEOUT env var)",
+    )
+    parser.add_argument(
+        "--num-retries",
+        type=int,
+        default=DEFAULT_NUM_RETRIES,
+        help=f"Retries of a failed Typesense request, across nodes (default: "
+        f"{DEFAULT_NUM_RETRIES} or TYPESENSE_NUM_RETRIES env var)",
+    )
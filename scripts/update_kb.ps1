@@ -106,6 +106,16 @@ try {
             }
         }
     }
+
+    # Refresh the FAISS index for notes this update changed (only if one exists)
+    if (Test-Path ".kb_index/index.faiss") {
+        Write-Host ""
+        Write-Host "Refreshing FAISS index for changed notes..."
+        & uv run --active --with faiss-cpu --with numpy --with sentence-transformers --with tqdm python scripts/index_kb.py --git-changes
+        if ($LASTEXITCODE -ne 0) {
+            Write-Host "Index refresh failed; run scripts/index_kb.py manually"
+        }
+    }
 } finally {
     Pop-Location
 }
@@ -139,6 +139,21 @@ else
     git pull origin main || git pull origin master || echo "⚠️  Pull failed, trying submodule update..."
 fi
 
+# Refresh the FAISS index for notes this update changed (only if one exists)
+if [ -f ".kb_index/index.faiss" ]; then
+    echo ""
+    echo "🧠 Refreshing FAISS index for changed notes..."
+    KB_PYTHON="${AGENTIC_KB_UV_ENV:-$(pwd)/.venv}/bin/python"
+    if [ -x "$KB_PYTHON" ]; then
+        "$KB_PYTHON" scripts/index_kb.py --git-changes \
+            || echo "⚠️  Index refresh failed; run scripts/index_kb.py manually"
+    else
+        uv run --no-project --with faiss-cpu --with numpy --with sentence-transformers --with tqdm \
+            python scripts/index_kb.py --git-changes \
+            || echo "⚠️  Index refresh failed; run scripts/index_kb.py manually"
+    fi
+fi
+
 cd - > /dev/null
 
 # Update parent project's submodule pointer only when it is a relative submodule path
@@ -0,0 +1,365 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.encoders import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL  # noqa: E402
+from scripts.ingest import iter_markdown_files  # noqa: E402
+from scripts.typesense_client import add_connection_arguments  # noqa: E402
+
+KNOWLEDGE_DIR = ROOT / "knowledge"
+# Quiet time after the last change before indexes are updated, so an
+# editor's save (temp file, rename, chmod) or a `git pull` is one update.
+DEFAULT_DEBOUNCE_SECONDS = 1.0
+# A steady stream of changes is still flushed this often.
+MAX_DELAY_SECONDS = 10.0
+DEFAULT_POLL_SECONDS = 2.0
+
+# <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_note(path: Path) -> bool:
+    # Same notes iter_markdown_files() yields.
+    return path.suffix == ".md" and not path.name.startswith("_")
+
+
+class InotifyWatcher:
+    """Linux inotify through libc: one watch per directory under ``root``.
+
+    ``changes()`` returns the notes created, modified or deleted since the
+    last call, or None when that is unknown (a directory moved away, or the
+    kernel event queue overflowed) and everything must be rescanned.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        libc = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        try:
+            self._add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def _add_tree(self, top: Path) -> Set[Path]:
+        """Watch ``top`` and its subdirectories; returns the notes already in them."""
+        notes = set()
+        for dirpath, _, filenames in os.walk(top):
+            directory = Path(dirpath)
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                # ENOSPC: fs.inotify.max_user_watches reached.
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            self._dirs[wd] = directory
+            notes.update(directory / name for name in filenames if is_note(directory / name))
+        return notes
+
+    def changes(self, timeout: Optional[float] = None) -> Optional[Set[Path]]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed: Set[Path] = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                start = offset + EVENT_HEADER.size
+                name = os.fsdecode(data[start:start + length].rstrip(b"\0"))
+                offset = start + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / name
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed.update(self._add_tree(path))
+                    elif mask & IN_MOVED_FROM:
+                        # Its notes are gone, but their names are unknown here.
+                        rescan = True
+                elif is_note(path):
+                    changed.add(path)
+        return None if rescan else changed
+
+
+class PollingWatcher:
+    """Finds changed notes by comparing stat() snapshots every ``interval`` seconds."""
+
+    def __init__(self, root: Path, interval: float = DEFAULT_POLL_SECONDS) -> None:
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def close(self) -> None:
+        pass
+
+    def _scan(self) -> Dict[Path, tuple]:
+        snapshot = {}
+        for path in iter_markdown_files(self.root):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+        return snapshot
+
+    def changes(self, timeout: Optional[float] = None) -> Optional[Set[Path]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {
+                path
+                for path in current.keys() | self._snapshot.keys()
+                if current.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = current
+            if changed:
+                return changed
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return set()
+            time.sleep(wait)
+
+
+def open_watcher(root: Path, poll: bool = False, interval: float = DEFAULT_POLL_SECONDS):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling every {interval:g}s")
+    return PollingWatcher(root, interval)
+
+
+def collect(watcher, debounce: float) -> Optional[Set[Path]]:
+    """Block for the next change, then gather more until ``debounce`` seconds pass quietly."""
+    pending: Optional[Set[Path]] = set()
+    while pending is not None and not pending:
+        pending = watcher.changes()
+    first = time.monotonic()
+    while time.monotonic() - first < MAX_DELAY_SECONDS:
+        more = watcher.changes(debounce)
+        if not more and more is not None:
+            break
+        pending = None if pending is None or more is None else pending | more
+    return pending
+
+
+class Updater:
+    """Pushes changed notes through the incremental FAISS, BM25 and Typesense paths."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self._model = None
+        # Notes each backend has not taken yet (None: needs a full pass), so
+        # a failed update is retried with the next batch of changes.
+        self._pending: Dict[str, Optional[Set[Path]]] = {
+            "FAISS": set(),
+            "BM25": set(),
+            "Typesense": set(),
+        }
+
+    def model(self):
+        if self._model is None:
+            from scripts.encoders import load_encoder
+
+            self._model = load_encoder(self.args.model, self.args.backend)
+        return self._model
+
+    def update(self, paths: Optional[Set[Path]]) -> None:
+        """Index ``paths`` (None: check every note) and print one summary line."""
+        args = self.args
+        start = time.perf_counter()
+        parts: List[str] = []
+        if not args.no_faiss:
+            parts.append(self.run("FAISS", paths, self.update_faiss))
+        if not args.no_bm25:
+            parts.append(self.run("BM25", paths, self.update_bm25))
+        if not args.no_typesense:
+            parts.append(self.run("Typesense", paths, self.update_typesense))
+        noun = "every note" if paths is None else f"{len(paths)} note(s)"
+        elapsed = time.perf_counter() - start
+        stamp = time.strftime("%H:%M:%S")
+        print(f"[{stamp}] Updated {noun} in {elapsed:.2f}s: {'; '.join(parts)}")
+
+    def run(
+        self,
+        name: str,
+        paths: Optional[Set[Path]],
+        update: Callable[[Optional[Set[Path]]], Optional[str]],
+    ) -> str:
+        """Update one backend with ``paths`` plus whatever it missed before.
+
+        A failure (an unreadable note, a locked database, Typesense being
+        down) is reported instead of stopping the watcher; the notes stay
+        pending until an update succeeds.
+        """
+        pending = self._pending[name]
+        if paths is None or pending is None:
+            pending = None
+        else:
+            pending = pending | paths
+        self._pending[name] = pending
+        try:
+            summary = update(None if pending is None else set(pending))
+        except Exception as e:
+            return f"{name} failed ({type(e).__name__}: {e}), will retry"
+        if summary is None:
+            return f"{name} down, will retry"
+        self._pending[name] = set()
+        return summary
+
+    def update_faiss(self, paths: Optional[Set[Path]]) -> str:
+        from scripts.query_cache import model_key
+        from scripts.search import build_index
+
+        args = self.args
+        stats = build_index(
+            self.model(),
+            model_id=model_key(args.model, args.backend),
+            changed=paths,
+            verbose=False,
+        )
+        return f"FAISS {stats['chunks_embedded']} embedded/{stats['chunks_reused']} reused"
+
+    def update_bm25(self, paths: Optional[Set[Path]]) -> str:
+        from scripts.search_bm25 import build_bm25_index
+
+        stats = build_bm25_index(changed=paths)
+        return f"BM25 {stats['rebuilt'] + stats['deleted']} notes"
+
+    def update_typesense(self, paths: Optional[Set[Path]]) -> Optional[str]:
+        """Sync ``paths``; None (without raising) when the server is down."""
+        from scripts.typesense_client import healthcheck
+
+        args = self.args
+        if not healthcheck(args.host, args.port):
+            return None
+        from scripts.index_typesense import suppress_typesense_warnings, sync_documents
+        from scripts.typesense_client import client_from_args
+
+        with suppress_typesense_warnings():
+            stats = sync_documents(
+                client_from_args(args),
+                args.collection,
+                paths=None if paths is None else sorted(paths),
+            )
+        if stats['failed']:
+            raise RuntimeError(f"{stats['failed']} chunks failed")
+        return f"Typesense {stats['imported']} upserted/{stats['deleted']} deleted"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Watch knowledge/ and keep the FAISS, BM25 and Typesense indexes "
+        "up to date as notes change."
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help="Seconds without changes before updating "
+        f"(default: {DEFAULT_DEBOUNCE_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll file stat data instead of using inotify",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help=f"Seconds between polls (default: {DEFAULT_POLL_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--no-faiss", action="store_true", help="Do not update the FAISS index"
+    )
+    parser.add_argument(
+        "--no-bm25", action="store_true", help="Do not update the BM25 index"
+    )
+    parser.add_argument(
+        "--no-typesense", action="store_true", help="Do not sync the Typesense collection"
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Local model name or path")
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=BACKENDS,
+        help="Encoder backend (default: torch or KB_ENCODER_BACKEND env var)",
+    )
+    add_connection_arguments(parser)
+    parser.add_argument(
+        "--collection", default="kb_chunks", help="Collection name (default: kb_chunks)"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    watcher = open_watcher(KNOWLEDGE_DIR, args.poll, args.poll_interval)
+    updater = Updater(args)
+    # Catch up on edits made while nothing was watching.
+    updater.update(None)
+    kind = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+    print(f"Watching {KNOWLEDGE_DIR} ({kind}); Ctrl+C to stop")
+    try:
+        while True:
+            updater.update(collect(watcher, args.debounce))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()
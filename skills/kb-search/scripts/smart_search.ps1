@@ -1,5 +1,5 @@
 #!/usr/bin/env pwsh
-# Smart KB search: Try Typesense first, fallback to FAISS if no good results
+# Smart KB search: Typesense and FAISS in parallel, FAISS when Typesense hits are weak
 
 param(
     [Parameter(Mandatory = $true, Position = 0)]
@@ -52,45 +52,12 @@ $localUvCacheDir = Join-Path $resolvedKbPath ".uv-cache"
 New-Item -ItemType Directory -Path $localUvCacheDir -Force | Out-Null
 $env:UV_CACHE_DIR = $localUvCacheDir
 
-Write-Host "Searching KB for: $Query"
-Write-Host ""
-Write-Host "Trying Typesense (fast full-text search)..."
-
-$tempResults = [System.IO.Path]::GetTempFileName()
-try {
-    $typesenseArgs = @("run", "--active", "--with", "typesense", "python", (Join-Path $KbPath "scripts/search_typesense.py"), $Query)
-    if (-not [string]::IsNullOrWhiteSpace($Filter)) {
-        $typesenseArgs += @("--filter", $Filter)
-    }
-
-    $typesenseOutput = & uv @typesenseArgs 2>&1
-    $typesenseExitCode = $LASTEXITCODE
-    $typesenseOutput | Set-Content -Path $tempResults
-
-    if ($typesenseExitCode -eq 0) {
-        $resultCount = (Get-Content -Path $tempResults | Measure-Object -Line).Lines
-        if ($resultCount -gt 5) {
-            Write-Host "Found results in Typesense:"
-            Write-Host ""
-            Get-Content -Path $tempResults
-            exit 0
-        }
-        Write-Host "Typesense returned few/no results"
-    } else {
-        Write-Host "Typesense search failed (server might not be running)"
-    }
-} finally {
-    Remove-Item -Path $tempResults -ErrorAction SilentlyContinue
+# Typesense and FAISS run concurrently in one Python process; Typesense hits
+# win when they match every query token, otherwise FAISS results are shown.
+$smartArgs = @("run", "--active", "--with", "typesense", "--with", "faiss-cpu", "--with", "numpy", "--with", "sentence-transformers", "python", (Join-Path $resolvedKbPath "scripts/smart_search.py"), $Query, "--min-score", $MinScore)
+if (-not [string]::IsNullOrWhiteSpace($Filter)) {
+    $smartArgs += @("--filter", $Filter)
 }
 
-Write-Host ""
-Write-Host "Falling back to FAISS (semantic vector search)..."
-Write-Host ""
-
-Push-Location $KbPath
-try {
-    & uv run --active --with faiss-cpu --with numpy --with sentence-transformers python scripts/search.py $Query --min-score $MinScore
-    exit $LASTEXITCODE
-} finally {
-    Pop-Location
-}
+& uv @smartArgs
+exit $LASTEXITCODE
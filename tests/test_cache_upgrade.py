@@ -0,0 +1,104 @@
+import hashlib
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("tqdm")
+
+ROOT = Path(__file__).resolve().parents[1]
+DIM = 16
+
+NOTES = {
+    "knowledge/Tools/grep.md": "# Grep\n\n## Usage\n\nSearch files for a pattern.\n",
+    "knowledge/Tools/sed.md": "# Sed\n\n## Usage\n\nEdit streams in place.\n\n## Notes\n\nMind -i.\n",
+}
+
+# Runs inside the copied KB: scripts find knowledge/ and .kb_index/ next to
+# themselves. A bag-of-words encoder stands in for the model.
+BUILD = """
+import hashlib
+import sys
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, ".")
+from scripts.chunk_store import ChunkStore
+from scripts.search import CHUNKS_PATH, INDEX_PATH, build_index
+
+
+class Encoder:
+    def get_sentence_embedding_dimension(self):
+        return {dim}
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+        out = np.zeros((len(texts), {dim}), dtype="float32")
+        for i, text in enumerate(texts):
+            for word in text.split():
+                out[i, int(hashlib.md5(word.encode()).hexdigest(), 16) % {dim}] += 1
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-9)
+
+
+stats = build_index(Encoder(), verbose=False)
+store = ChunkStore(CHUNKS_PATH)
+print(stats["chunks"], faiss.read_index(str(INDEX_PATH)).ntotal, len(store))
+store.close()
+""".format(dim=DIM)
+
+
+def write_baseline_cache(kb: Path) -> None:
+    """The per-note cache layout of the original search.py."""
+    cache_dir = kb / ".kb_index" / "cache"
+    cache_dir.mkdir(parents=True)
+    files = {}
+    for rel_path in NOTES:
+        path = kb / rel_path
+        key = rel_path.replace("/", "__")
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        text = path.read_text(encoding="utf-8")
+        chunks = [{"text": text, "path": rel_path, "heading": "Document"}]
+        (cache_dir / f"{key}.json").write_text(
+            json.dumps({"hash": digest, "chunks": chunks}), encoding="utf-8"
+        )
+        np.save(cache_dir / f"{key}.npy", np.ones((1, DIM), dtype="float32"))
+        files[rel_path] = {"hash": digest, "key": key}
+    (kb / ".kb_index" / "cache_index.json").write_text(
+        json.dumps({"files": files}), encoding="utf-8"
+    )
+
+
+def run_build(kb: Path) -> list:
+    result = subprocess.run(
+        [sys.executable, "-c", BUILD],
+        cwd=kb,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr
+    return [int(n) for n in result.stdout.split()[-3:]]
+
+
+def test_build_index_upgrades_baseline_cache(tmp_path: Path) -> None:
+    shutil.copytree(
+        ROOT / "scripts", tmp_path / "scripts", ignore=shutil.ignore_patterns("__pycache__")
+    )
+    for rel_path, text in NOTES.items():
+        (tmp_path / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel_path).write_text(text, encoding="utf-8")
+    write_baseline_cache(tmp_path)
+
+    chunks, vectors, records = run_build(tmp_path)
+    assert chunks == vectors == records
+    state = json.loads((tmp_path / ".kb_index" / "cache_index.json").read_text())
+    assert all("hashes" in entry for entry in state["files"].values())
+    assert not list((tmp_path / ".kb_index" / "cache").glob("*.npy"))
+
+    # The next build starts from the packed cache.
+    assert run_build(tmp_path) == [chunks, vectors, records]
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.ingest import chunk_markdown, count_tokens, split_sections  # noqa: E402
+
+MAX_TOKENS = 240
+
+
+@pytest.mark.parametrize(
+    "run",
+    ["漢字" * 1000, "→" * 1500, "é" * 900, "x" * 5000],
+    ids=["cjk", "symbols", "accented", "ascii"],
+)
+def test_unbroken_runs_fit_the_budget(run: str) -> None:
+    content = f"# Note\n\n## Section\n\n{run}\n\nA closing sentence.\n"
+    chunks = chunk_markdown(content, max_tokens=MAX_TOKENS)
+    assert len(chunks) > 1
+    assert max(count_tokens(text) for _, text in chunks) <= MAX_TOKENS
+
+
+def section_headings(content: str) -> list:
+    return [heading for _, heading, _, _ in split_sections(content)]
+
+
+def test_fence_closes_only_on_its_own_marker() -> None:
+    content = (
+        "# Note\n\n"
+        "````markdown\n"
+        "~~~\n"
+        "# not a heading\n"
+        "```\n"
+        "## still code\n"
+        "````\n\n"
+        "## Real\n\n"
+        "~~~bash\n"
+        "# a shell comment\n"
+        "```\n"
+        "~~~\n\n"
+        "## After\n\ntext\n"
+    )
+    assert section_headings(content) == ["Note", "Real", "After"]